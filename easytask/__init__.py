@@ -1,12 +1,39 @@
+from ._core.AdaptiveLimiter import AdaptiveLimiter
+from ._core.Batcher import Batcher
+from ._core import cluster
+from ._core.bench import run_bench
+from ._core.clock import Clock, VirtualClock, get_clock, set_clock
 from ._core.debug import print_debug_info
-from ._core.decorators import taskmethod
+from ._core.decorators import streammethod, taskmethod
 from ._core.exceptions import ETaskDone
+from ._core.FileReader import FileReader
+from ._core.futures import from_future, wait_all, wait_any
+from ._core.Graph import Graph
+from ._core.InterpreterThread import InterpreterThread
+from ._core.leak_detector import (get_leaked_tasks, is_leak_detection,
+                                  print_leak_report, set_leak_detection)
+from ._core.lock_profiler import (LockStats, get_lock_profile,
+                                  is_lock_profiling, print_lock_profile,
+                                  reset_lock_profile, set_lock_profiling)
 from ._core.log import get_log_level, set_log_level
+from ._core.periodic import every
+from ._core.process import (get_max_subprocesses, get_subprocesses_info,
+                            set_max_subprocesses)
+from ._core.recorder import (WorkloadTrace, is_recording, start_recording,
+                             stop_recording)
 from ._core.service import clear
+from ._core.SharedBuffer import SharedBuffer, SharedBufferPool
+from ._core.StreamTask import StreamTask
 from ._core.Task import Task, get_current_task
 from ._core.Taskset import Taskset
 from ._core.test import run_test
-from ._core.Thread import Thread, get_current_thread
-from ._core.yields import (yield_add_to, yield_cancel, yield_propagate,
-                           yield_sleep, yield_sleep_tick, yield_success,
+from ._core.Thread import (Thread, create_pinned_threads, get_current_thread,
+                           get_numa_nodes)
+from ._core.watchdog import (WatchdogReport, is_watchdog_running,
+                             start_watchdog, stop_watchdog)
+from ._core.yields import (yield_add_to, yield_admit, yield_batch, yield_call,
+                           yield_cancel, yield_emit, yield_next,
+                           yield_propagate, yield_read, yield_read_file,
+                           yield_remote, yield_sleep, yield_sleep_tick, yield_sleep_until,
+                           yield_subprocess, yield_success,
                            yield_switch_thread, yield_wait)
@@ -0,0 +1,146 @@
+from typing import Dict
+
+from .clock import Clock, get_clock
+from .lock_profiler import create_lock
+from .Task import Task
+
+
+class AdaptiveLimiter:
+    def __init__(self, initial_limit : int = 8, min_limit : int = 1, max_limit : int = 1000,
+                       target_latency : float = None, tolerance : float = 2.0, backoff : float = 0.9,
+                       max_queue : int = None, clock : Clock = None, name : str = None):
+        """
+        Limits amount of concurrently executed Tasks, and adapts the limit to observed latency of the Tasks (AIMD).
+
+        Task is admitted with `yield easytask.yield_admit(limiter)`,
+        excess Tasks are suspended without cost in FIFO queue until admitted Tasks are done.
+        Latency is the time from admission until the Task is done.
+
+        Limit grows by 1 per `limit` completions while it is fully used,
+        and is multiplied by `backoff` on latency above the target, at most once per observed latency.
+
+            target_latency(None)    latency in seconds, above which the limit decreases.
+                                    Default is `tolerance` * minimal observed latency.
+
+            max_queue(None)         if specified, exception is raised in the Task when the queue is full
+
+            clock(None)             default is global easytask.get_clock()
+        """
+        if not (1 <= min_limit <= initial_limit <= max_limit):
+            raise ValueError('must be 1 <= min_limit <= initial_limit <= max_limit')
+
+        self._min_limit = min_limit
+        self._max_limit = max_limit
+        self._target_latency = target_latency
+        self._tolerance = tolerance
+        self._backoff = backoff
+        self._max_queue = max_queue
+        self._clock = clock
+        self._name = name
+
+        self._lock = create_lock('AdaptiveLimiter._lock')
+        self._limit = float(initial_limit)
+        self._in_flight = 0
+        self._queue = {}            # parked TaskExecutor -> None, in order of arrival
+        self._latency = None        # smoothed latency
+        self._min_latency = None
+        self._next_decrease = 0.0
+
+    def get_name(self) -> str: return self._name
+    def get_limit(self) -> int: return int(self._limit)
+    def get_in_flight(self) -> int: return self._in_flight
+    def get_queue_depth(self) -> int: return len(self._queue)
+
+    def get_info(self) -> Dict[str, float]:
+        with self._lock:
+            return {'limit' : int(self._limit),
+                    'in_flight' : self._in_flight,
+                    'queued' : len(self._queue),
+                    'latency' : self._latency,
+                    'min_latency' : self._min_latency }
+
+    def _get_clock(self) -> Clock:
+        clock = self._clock
+        return clock if clock is not None else get_clock()
+
+    def _admit(self, executor):
+        # called from yield_admit handler
+        with self._lock:
+            if self._in_flight < int(self._limit) and len(self._queue) == 0:
+                self._in_flight += 1
+                admitted, rejected = True, False
+            elif self._max_queue is not None and len(self._queue) >= self._max_queue:
+                admitted, rejected = False, True
+            else:
+                admitted, rejected = False, False
+                executor._park()
+                self._queue[executor] = None
+
+        if admitted:
+            executor._continue_execution = True
+            self._on_admitted(executor._task)
+        elif rejected:
+            executor._continue_execution = True
+            executor._throw_param = Exception(f'{self} queue is full.')
+        else:
+            # cancelled Task leaves the queue
+            executor._task.call_on_done(lambda task, executor=executor: self._on_queued_done(executor))
+
+    def _on_queued_done(self, executor):
+        with self._lock:
+            self._queue.pop(executor, None)
+
+    def _on_admitted(self, task : Task):
+        time_start = self._get_clock().time()
+        task.call_on_done(lambda task, time_start=time_start: self._on_done(task, time_start))
+
+    def _on_done(self, task : Task, time_start : float):
+        now = self._get_clock().time()
+
+        with self._lock:
+            self._in_flight -= 1
+            if task.is_succeeded() or task.exception() is not None:
+                # Tasks cancelled without exception don't report latency
+                self._update_limit(now, now - time_start)
+
+            executors = []
+            queue = self._queue
+            while len(queue) != 0 and self._in_flight < int(self._limit):
+                executor = next(iter(queue))
+                del queue[executor]
+                self._in_flight += 1
+                executors.append(executor)
+
+        for executor in executors:
+            self._on_admitted(executor._task)
+            executor._wake()
+
+    def _update_limit(self, now : float, latency : float):
+        # inside self._lock
+        if self._min_latency is None:
+            self._min_latency = self._latency = latency
+        else:
+            # minimum slowly drifts up, so the limiter follows permanent change of the latency
+            self._min_latency = min(latency, self._min_latency * 1.001)
+            self._latency += (latency - self._latency) * 0.1
+
+        target_latency = self._target_latency
+        if target_latency is None:
+            target_latency = self._min_latency * self._tolerance
+
+        limit = self._limit
+        if latency > target_latency:
+            if now >= self._next_decrease:
+                self._limit = max(self._min_limit, limit * self._backoff)
+                self._next_decrease = now + latency
+        elif self._in_flight + 1 >= int(limit):
+            # limit is fully used
+            self._limit = min(self._max_limit, limit + 1.0 / limit)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        s = '[AdaptiveLimiter]'
+        if self._name is not None:
+            s += f'[{self._name}]'
+        s += f'[{self._in_flight}/{int(self._limit)}][{len(self._queue)} queued]'
+        return s
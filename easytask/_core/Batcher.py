@@ -0,0 +1,166 @@
+import traceback
+from collections import deque
+from typing import Callable, List
+
+from .lock_profiler import create_lock
+from .log import get_log_level
+from .Task import Task
+from .Thread import Thread, _find_current_thread, get_current_thread
+
+
+class _BatchTimer:
+    # timer entry of Thread, flushes the batch on max_delay
+    _sched_group = None
+
+    def __init__(self, batcher : 'Batcher'):
+        self._batcher = batcher
+        self._cancelled = False
+
+    def get_name(self) -> str: return f'{self._batcher} timer'
+    def is_done(self) -> bool: return self._cancelled
+
+    def cancel(self):
+        # called by finalize of the Thread, the batch is processed without delay
+        if not self._cancelled:
+            self._cancelled = True
+            self._batcher._on_timer(self)
+
+    def _exec(self):
+        if not self._cancelled:
+            self._batcher._on_timer(self)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[BatchTimer][{self._batcher.get_name()}]'
+
+
+class Batcher:
+    def __init__(self, func : Callable[ [List], List ], max_size : int = 64, max_delay : float = 0.005,
+                       thread : Thread = None, name : str = None):
+        """
+        Coalesces items of many Tasks into single call of `func(items)`.
+
+        Tasks add items with `result = yield easytask.yield_batch(batcher, item)`.
+
+            func        called with list of items, returns list of results in the same order,
+                        or Task with such list as result.
+                        Result which is an instance of Exception is raised in the Task of the item.
+                        Exception of `func` is raised in all Tasks of the batch.
+
+            max_size(64)        batch is processed when it reaches `max_size` items,
+                                in the Thread of the Task added the last item
+
+            max_delay(0.005)    or when `max_delay` seconds passed since first item of the batch,
+                                in `thread`, or immediately when `thread` is finalized
+
+        `func` is executed outside of the Task which triggered the batch,
+        Tasks it creates don't inherit Taskset's of that Task.
+
+            thread(None)        Thread of the delay timer, default is current Thread
+        """
+        if thread is None:
+            thread = get_current_thread()
+
+        self._func = func
+        self._max_size = max_size
+        self._max_delay = max_delay
+        self._thread = thread
+        self._name = name if name is not None else getattr(func, '__qualname__', str(func))
+
+        self._lock = create_lock('Batcher._lock')
+        self._batch = []        # [ (TaskExecutor, item) ]
+        self._timer : _BatchTimer = None
+
+    def get_name(self) -> str: return self._name
+
+    def flush(self):
+        """Process collected items now."""
+        with self._lock:
+            batch = self._take_batch()
+        if batch is not None:
+            self._process(batch)
+
+    def _add(self, executor, item):
+        # called from yield_batch handler, executor is parked
+        with self._lock:
+            batch = self._batch
+            batch.append( (executor, item) )
+
+            if len(batch) >= self._max_size:
+                batch = self._take_batch()
+            elif len(batch) == 1:
+                self._timer = timer = _BatchTimer(self)
+                if self._thread._add_timer(self._thread.get_clock().time() + self._max_delay, timer):
+                    batch = None
+                else:
+                    # timer Thread is finalized, don't delay
+                    batch = self._take_batch()
+            else:
+                batch = None
+
+        if batch is not None:
+            self._process(batch)
+
+    def _on_timer(self, timer : _BatchTimer):
+        with self._lock:
+            batch = self._take_batch() if self._timer is timer else None
+        if batch is not None:
+            self._process(batch)
+
+    def _take_batch(self) -> List:
+        # inside self._lock
+        batch, self._batch = self._batch, []
+        if self._timer is not None:
+            self._timer._cancelled = True
+            self._timer = None
+        return batch if len(batch) != 0 else None
+
+    def _process(self, batch : List):
+        # skip items of cancelled Tasks
+        batch = [ (executor, item) for executor, item in batch if not executor._task.is_done() ]
+        if len(batch) == 0:
+            return
+
+        # func is not part of the Task which added the last item
+        thread = _find_current_thread()
+        tls = thread.get_tls() if thread is not None else None
+        if tls is not None:
+            task_exec_stack, tls._task_exec_stack = tls._task_exec_stack, deque()
+        try:
+            results = self._func([ item for _, item in batch ])
+        except Exception as e:
+            if get_log_level() >= 1:
+                print(f'Unhandled exception {e} occured in {self}. Traceback:\n{traceback.format_exc()}')
+            self._resolve(batch, exception=e)
+            return
+        finally:
+            if tls is not None:
+                tls._task_exec_stack = task_exec_stack
+
+        if isinstance(results, Task):
+            results.call_on_done(lambda task, batch=batch: self._resolve_task(batch, task))
+        else:
+            self._resolve(batch, results)
+
+    def _resolve_task(self, batch : List, task : Task):
+        if task.is_succeeded():
+            self._resolve(batch, task.result())
+        else:
+            exception = task.exception()
+            self._resolve(batch, exception=exception if exception is not None else Exception(f'{task} is cancelled.'))
+
+    def _resolve(self, batch : List, results : List = None, exception : Exception = None):
+        if exception is None and (results is None or len(results) != len(batch)):
+            exception = Exception(f'{self} func returned {len(results) if results is not None else None} results for {len(batch)} items.')
+
+        for i, (executor, _) in enumerate(batch):
+            if exception is not None:
+                executor._wake(throw_param=exception)
+            else:
+                result = results[i]
+                if isinstance(result, Exception):
+                    executor._wake(throw_param=result)
+                else:
+                    executor._wake(send_param=result)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[Batcher][{self._name}]'
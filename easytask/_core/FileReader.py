@@ -0,0 +1,221 @@
+import os
+import queue
+import threading
+from typing import Callable, List, Union
+
+from .lock_profiler import create_lock
+from .Task import Task, get_current_task
+
+
+class _IOPool:
+    _THREADS_COUNT = 2
+
+    def __init__(self):
+        """Small pool of OS threads doing blocking file reads"""
+        self._jobs = queue.SimpleQueue()
+        for i in range(_IOPool._THREADS_COUNT):
+            threading.Thread(target=self._thread_func, name=f'easytask io #{i}', daemon=True).start()
+
+    def submit(self, func : Callable[[], None]):
+        self._jobs.put(func)
+
+    def _thread_func(self):
+        while True:
+            self._jobs.get()()
+
+_IO_POOL : _IOPool = None
+_IO_POOL_LOCK = create_lock('FileReader._IO_POOL_LOCK')
+
+def _get_io_pool() -> _IOPool:
+    global _IO_POOL
+    pool = _IO_POOL
+    if pool is None:
+        with _IO_POOL_LOCK:
+            pool = _IO_POOL
+            if pool is None:
+                pool = _IO_POOL = _IOPool()
+    return pool
+
+def _pread_into(fd : int, view : memoryview, offset : int) -> int:
+    """read into view at file offset until view is full or EOF, returns amount of read bytes"""
+    total = 0
+    size = len(view)
+    while total < size:
+        if hasattr(os, 'preadv'):
+            count = os.preadv(fd, [view[total:]], offset + total)
+        else:
+            data = os.pread(fd, size - total, offset + total)
+            count = len(data)
+            view[total:total+count] = data
+        if count == 0:
+            break
+        total += count
+    return total
+
+def _read_file(executor, path : str, offset : int, size : Union[int, None]):
+    # executed in I/O pool for yield_read_file, wakes parked executor
+    try:
+        fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        try:
+            if size is None:
+                size = max(0, os.fstat(fd).st_size - offset)
+            buf = bytearray(size)
+            count = _pread_into(fd, memoryview(buf), offset)
+        finally:
+            os.close(fd)
+    except Exception as e:
+        executor._wake(throw_param=e)
+        return
+    executor._wake(send_param=memoryview(buf)[:count])
+
+
+class _Slot:
+    def __init__(self, chunk_size : int):
+        # recycled buffer of FileReader
+        self._buf = bytearray(chunk_size)
+        self._index = None          # index of chunk read into the buffer
+        self._ready = False
+        self._count = 0
+        self._exception : Exception = None
+
+
+class FileReader:
+    def __init__(self, path : str, chunk_size : int = 1024*1024, readahead : int = 4, offset : int = 0, size : int = None, task : Task = None):
+        """
+        Sequential reader of file by chunks in I/O threads, used with `chunk = yield easytask.yield_read(reader)`.
+
+        Next `readahead` chunks are read in background while the Task processes current chunk.
+        Chunks are memoryviews of `readahead` recycled buffers, so memory usage is fixed.
+
+            offset(0)       start position in file
+            size(None)      amount of bytes to read, default until end of file
+
+            task(None)      close the reader when Task is done.
+                            Default is current Task. Outside of Task you must call close() manually.
+        """
+        if readahead < 1:
+            raise ValueError('readahead must be >= 1')
+
+        self._path = path
+        self._chunk_size = chunk_size
+        self._offset = offset
+
+        self._fd = os.open(path, os.O_RDONLY | getattr(os, 'O_BINARY', 0))
+        if size is None:
+            size = max(0, os.fstat(self._fd).st_size - offset)
+        self._size = size
+        self._chunks_count = (size + chunk_size - 1) // chunk_size
+
+        self._lock = create_lock('FileReader._lock')
+        self._slots : List[_Slot] = [ _Slot(chunk_size) for _ in range(min(readahead, max(1, self._chunks_count))) ]
+        self._next_index = 0        # index of chunk returned by next yield_read
+        self._waiter = None         # parked TaskExecutor waiting for _next_index
+        self._reads_count = 0       # reads in I/O pool
+        self._closed = False
+
+        for i in range(len(self._slots)):
+            self._submit(i)
+
+        if task is None:
+            task = get_current_task()
+        if task is not None:
+            task.call_on_done(lambda task: self.close())
+
+    def get_path(self) -> str: return self._path
+    def get_size(self) -> int: return self._size
+
+    def close(self):
+        """Stop reading, file is closed when reads in progress are finished."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            close_fd = self._reads_count == 0
+            waiter, self._waiter = self._waiter, None
+
+        if close_fd:
+            os.close(self._fd)
+        if waiter is not None:
+            waiter._wake(throw_param=Exception(f'{self} is closed.'))
+
+    def _submit(self, index : int):
+        # start reading of chunk into its slot
+        slot = self._slots[index % len(self._slots)]
+        with self._lock:
+            if self._closed or index >= self._chunks_count:
+                return
+            slot._index = index
+            slot._ready = False
+            slot._exception = None
+            self._reads_count += 1
+
+        _get_io_pool().submit(lambda: self._read_chunk(slot, index))
+
+    def _read_chunk(self, slot : _Slot, index : int):
+        # executed in I/O pool
+        pos = index * self._chunk_size
+        size = min(self._chunk_size, self._size - pos)
+        count, exception = 0, None
+        try:
+            count = _pread_into(self._fd, memoryview(slot._buf)[:size], self._offset + pos)
+        except Exception as e:
+            exception = e
+
+        with self._lock:
+            slot._count = count
+            slot._exception = exception
+            slot._ready = True
+            self._reads_count -= 1
+            close_fd = self._closed and self._reads_count == 0
+
+            waiter = None
+            if self._waiter is not None and self._next_index == index:
+                waiter, self._waiter = self._waiter, None
+
+        if close_fd:
+            os.close(self._fd)
+        if waiter is not None:
+            self._resume(waiter, slot, index)
+
+    def _read(self, executor):
+        # called from yield_read handler
+        with self._lock:
+            closed = self._closed
+            index = self._next_index
+            if not closed and index < self._chunks_count:
+                slot = self._slots[index % len(self._slots)]
+                if not slot._ready:
+                    # wait the chunk without cost
+                    executor._park()
+                    self._waiter = executor
+                    return
+
+        # continue execution of Task immediately
+        executor._continue_execution = True
+        if closed:
+            executor._throw_param = Exception(f'{self} is closed.')
+        elif index >= self._chunks_count:
+            # EOF
+            executor._send_param = memoryview(b'')
+        else:
+            self._resume(executor, slot, index, wake=False)
+
+    def _resume(self, executor, slot : _Slot, index : int, wake : bool = True):
+        # buffer of previous chunk is not used anymore, read next chunk into it
+        if index != 0:
+            self._submit(index - 1 + len(self._slots))
+        self._next_index = index + 1
+
+        if slot._exception is not None:
+            send_param, throw_param = None, slot._exception
+        else:
+            send_param, throw_param = memoryview(slot._buf)[:slot._count], None
+
+        if wake:
+            executor._wake(send_param=send_param, throw_param=throw_param)
+        else:
+            executor._send_param = send_param
+            executor._throw_param = throw_param
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[FileReader][{self._path}]'
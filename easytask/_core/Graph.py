@@ -0,0 +1,296 @@
+from collections import deque
+from typing import Any, Callable, Dict, List, Union
+
+from .lock_profiler import create_lock
+from .log import get_log_level
+from .Task import Task, get_current_task
+from .TaskExecutor import TaskExecutor
+from .Thread import Thread, get_current_thread
+from .yields import yield_propagate, yield_switch_thread
+
+
+class Graph:
+    class Node:
+        def __init__(self, graph : 'Graph', name : str, func : Callable, args, kwargs, thread : Thread):
+            self._graph = graph
+            self._name = name
+            self._func = func
+            self._args = args
+            self._kwargs = kwargs
+            self._thread = thread
+
+            self._deps : List[Graph.Node] = []
+            self._dependents : List[Graph.Node] = []
+            self._pending = 0           # count of not succeeded deps, accessed inside Graph._lock only
+            self._skipped = False       # node will never start because upstream node failed
+
+            self._task : Task = None
+            self._start_time = None
+            self._finish_time = None
+
+        def get_name(self) -> str: return self._name
+        def get_deps(self) -> List['Graph.Node']: return list(self._deps)
+        def get_task(self) -> Union[Task, None]:
+            """Task of started node, None if node is not started"""
+            return self._task
+
+        def is_skipped(self) -> bool:
+            """node is not started because of failed dependency"""
+            return self._skipped
+
+        def get_duration(self) -> Union[float, None]:
+            """execution time of finished node"""
+            if self._finish_time is None:
+                return None
+            return self._finish_time - self._start_time
+
+        def __repr__(self): return self.__str__()
+        def __str__(self):
+            s = f'[Graph.Node][{self._name}]'
+            if self._skipped:
+                s += '[SKIPPED]'
+            elif self._task is not None:
+                s += f'{self._task}'
+            return s
+
+    def __init__(self, name : str = None):
+        """
+        Graph of taskmethods with dependencies.
+
+        Each node is started when all its dependencies are succeeded,
+        results of dependencies are passed as last positional arguments in order of `deps`.
+        If node is failed, all nodes depending on it are skipped.
+
+        ```
+            g = easytask.Graph()
+            a = g.add_node('a', load, path)
+            b = g.add_node('b', process, deps=[a], thread=worker_thread) # process(a_result)
+            task = g.run()
+        ```
+        """
+        self._name = name
+        self._lock = create_lock('Graph._lock')
+        self._nodes : Dict[str, Graph.Node] = {}
+
+        self._task : Task = None
+        self._thread : Thread = None
+        self._remaining = 0         # count of not finished nodes, accessed inside Graph._lock only
+        self._ready = deque()       # nodes to start, accessed inside Graph._lock only
+        self._draining = False      # some call of _start_nodes is starting nodes from _ready
+
+    def get_name(self) -> str: return self._name
+    def get_nodes(self) -> List['Graph.Node']: return list(self._nodes.values())
+    def get_node(self, name : str) -> 'Graph.Node': return self._nodes[name]
+    def get_task(self) -> Union[Task, None]: return self._task
+
+    def add_node(self, name : str, func : Callable, *args, deps = (), thread : Thread = None, **kwargs) -> 'Graph.Node':
+        """
+        add node
+
+            name        str         unique name of node
+            func        Callable    taskmethod or regular function
+            deps(())    Iterable    Node's or names of nodes which have to succeed before this node
+            thread(None)  Thread    Thread where `func` will be called. Default is Thread where Graph.run() is called.
+        """
+        if self._task is not None:
+            raise Exception(f'{self} is already running.')
+        if name in self._nodes:
+            raise ValueError(f'Node {name} already exists in {self}.')
+
+        node = self._nodes[name] = Graph.Node(self, name, func, args, kwargs, thread)
+        for dep in deps:
+            self.add_edge(dep, node)
+        return node
+
+    def add_edge(self, from_node : Union['Graph.Node', str], to_node : Union['Graph.Node', str]):
+        """`to_node` depends on `from_node`"""
+        if self._task is not None:
+            raise Exception(f'{self} is already running.')
+
+        from_node, to_node = self._get_node(from_node), self._get_node(to_node)
+        if from_node in to_node._deps:
+            return
+        to_node._deps.append(from_node)
+        from_node._dependents.append(to_node)
+
+    def run(self) -> Task[Dict[str, Any]]:
+        """
+        Start the Graph.
+
+        Returns Task which succeeds with Dict[node name, result] when all nodes are succeeded,
+        or is cancelled with exception of first failed node when all nodes are finished.
+        Cancelling the Task cancels all started nodes.
+        """
+        if self._task is not None:
+            raise Exception(f'{self} is already running.')
+        self._check_acyclic()
+
+        self._thread = get_current_thread()
+        self._task = task = Task(name=f'Graph {self._name}' if self._name is not None else 'Graph')
+        task.call_on_done(self._on_graph_done)
+
+        nodes = self._nodes.values()
+        with self._lock:
+            self._remaining = len(nodes)
+            for node in nodes:
+                node._pending = len(node._deps)
+
+        if len(nodes) == 0:
+            task.success({})
+
+        self._start_nodes([ node for node in nodes if node._pending == 0 ])
+        return task
+
+    def get_critical_path(self) -> List['Graph.Node']:
+        """
+        Chain of finished nodes which determined finish time of the Graph.
+        From the first started node to the last finished node.
+        """
+        finished_nodes = [ node for node in self._nodes.values() if node._finish_time is not None ]
+        if len(finished_nodes) == 0:
+            return []
+
+        path = deque()
+        node = max(finished_nodes, key=lambda node: node._finish_time)
+        while node is not None:
+            path.appendleft(node)
+            deps = [ dep for dep in node._deps if dep._finish_time is not None ]
+            node = max(deps, key=lambda dep: dep._finish_time) if len(deps) != 0 else None
+        return list(path)
+
+    def get_printable_info(self) -> str:
+        s = f'{self}'
+        critical_path = self.get_critical_path()
+        if len(critical_path) != 0:
+            total_time = critical_path[-1]._finish_time - critical_path[0]._start_time
+            s += f'\nCritical path: {total_time:.3f}s'
+            for node in critical_path:
+                s += f'\n{node.get_duration():.3f}s {node}'
+        return s
+
+    def _get_node(self, node : Union['Graph.Node', str]) -> 'Graph.Node':
+        if isinstance(node, Graph.Node):
+            if node._graph is not self:
+                raise ValueError(f'{node} is not in {self}.')
+            return node
+        return self._nodes[node]
+
+    def _check_acyclic(self):
+        pending = { node : len(node._deps) for node in self._nodes.values() }
+        ready = deque( node for node, count in pending.items() if count == 0 )
+        visited = 0
+        while len(ready) != 0:
+            node = ready.popleft()
+            visited += 1
+            for dependent in node._dependents:
+                pending[dependent] -= 1
+                if pending[dependent] == 0:
+                    ready.append(dependent)
+
+        if visited != len(pending):
+            raise Exception(f'{self} has cyclic dependencies.')
+
+    def _get_node_thread(self, node : 'Graph.Node') -> Thread:
+        return node._thread if node._thread is not None else self._thread
+
+    def _start_nodes(self, nodes : List['Graph.Node']):
+        # node which finishes immediately readies its dependents inside _start_node,
+        # they are started by the outermost call in loop instead of recursion
+        with self._lock:
+            self._ready.extend(nodes)
+            if self._draining:
+                return
+            self._draining = True
+
+        while True:
+            with self._lock:
+                if len(self._ready) == 0:
+                    self._draining = False
+                    return
+                node = self._ready.popleft()
+
+            if not self._task.is_done():
+                self._start_node(node)
+
+    def _start_node(self, node : 'Graph.Node'):
+        args = node._args + tuple( dep._task.result() for dep in node._deps )
+        thread = self._get_node_thread(node)
+
+        node._start_time = thread.get_clock().time()
+        node._task = task = Task(name=f'Graph node {node._name}')
+        TaskExecutor(task, _exec_node(node._func, args, node._kwargs, thread))
+        task.call_on_done(lambda task, node=node: self._on_node_done(node))
+
+        if self._task.is_done():
+            # Graph was cancelled during start
+            task.cancel()
+
+    def _on_node_done(self, node : 'Graph.Node'):
+        node._finish_time = self._get_node_thread(node).get_clock().time()
+
+        ready_nodes = []
+        with self._lock:
+            self._remaining -= 1
+
+            if node._task.is_succeeded():
+                for dependent in node._dependents:
+                    dependent._pending -= 1
+                    if dependent._pending == 0:
+                        ready_nodes.append(dependent)
+            else:
+                # skip all downstream nodes
+                dependents = deque(node._dependents)
+                while len(dependents) != 0:
+                    dependent = dependents.popleft()
+                    if not dependent._skipped and dependent._task is None:
+                        dependent._skipped = True
+                        self._remaining -= 1
+                        dependents.extend(dependent._dependents)
+
+                if get_log_level() >= 2:
+                    print(f"{('Failed'):12} {node} in {self}")
+
+            remaining = self._remaining
+
+        if len(ready_nodes) != 0:
+            self._start_nodes(ready_nodes)
+
+        if remaining == 0:
+            self._finish()
+
+    def _finish(self):
+        nodes = self._nodes.values()
+        failed_nodes = [ node for node in nodes if node._task is not None and not node._task.is_succeeded() ]
+
+        if len(failed_nodes) == 0:
+            self._task.success({ node._name : node._task.result() for node in nodes })
+        else:
+            first_failed_node = min(failed_nodes, key=lambda node: node._finish_time)
+            self._task.cancel(exception=first_failed_node._task.exception())
+
+    def _on_graph_done(self, task : Task):
+        for node in self._nodes.values():
+            node_task = node._task
+            if node_task is not None:
+                node_task.cancel()
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        s = '[Graph]'
+        if self._name is not None:
+            s += f'[{self._name}]'
+        s += f'[{len(self._nodes)} nodes]'
+        if self._task is not None:
+            s += f'{self._task}'
+        return s
+
+
+def _exec_node(func, args, kwargs, thread : Thread):
+    yield yield_switch_thread(thread)
+
+    result = func(*args, **kwargs)
+    if isinstance(result, Task):
+        # Task started by the node is stopped with the node, when the graph is cancelled or failed
+        get_current_task().call_on_done(lambda task, result=result: result.cancel())
+        yield yield_propagate(result)
+    return result
@@ -0,0 +1,96 @@
+import concurrent.futures
+import itertools
+import threading
+from typing import Callable
+
+from .futures import from_future
+from .lock_profiler import create_lock
+from .Task import Task
+
+
+class InterpreterThread:
+    _unnamed_lock = threading.Lock()
+    _unnamed_counter = itertools.count(1)
+
+    def __init__(self, name : str = None, workers : int = 1):
+        """
+        Runs functions in isolated subinterpreters with own GIL, each on own OS thread.
+
+        Unlike easytask.Thread, Task's can not switch to InterpreterThread, because interpreters
+        don't share objects. Functions are submitted with run(...) and return a Task,
+        which is waited by the submitting Task on its own Thread.
+
+        Functions, arguments and results must be importable/picklable by the subinterpreter,
+        they are copied between interpreters.
+
+            workers(1)      amount of interpreters and OS threads
+
+        Requires Python 3.14+ (concurrent.futures.InterpreterPoolExecutor), otherwise raises Exception.
+        """
+        if not InterpreterThread.is_available():
+            raise Exception('InterpreterThread requires concurrent.futures.InterpreterPoolExecutor (Python 3.14+).')
+
+        if name is None:
+            with InterpreterThread._unnamed_lock:
+                name = f'Unnamed #{next(InterpreterThread._unnamed_counter)}'
+        self._name = name
+
+        self._lock = create_lock('InterpreterThread._lock')
+        self._executor = concurrent.futures.InterpreterPoolExecutor(max_workers=workers, thread_name_prefix=f'easytask {name}')
+        self._tasks = set()
+        self._finalized = False
+
+    @staticmethod
+    def is_available() -> bool:
+        return hasattr(concurrent.futures, 'InterpreterPoolExecutor')
+
+    def get_name(self) -> str: return self._name
+    def is_finalized(self) -> bool: return self._finalized
+
+    def run(self, func : Callable, *args, **kwargs) -> Task:
+        """
+        Run `func(*args, **kwargs)` in interpreter.
+
+        Returns Task which is done with result or exception of the function.
+        Cancellation of the Task cancels the call if it is not started yet.
+        If InterpreterThread is finalized, returned Task is cancelled.
+        """
+        name = f'{self._name} {getattr(func, "__qualname__", func)}'
+        with self._lock:
+            future = None if self._finalized else self._executor.submit(func, *args, **kwargs)
+
+        if future is None:
+            task = Task(name=name)
+            task.cancel()
+            return task
+
+        task = from_future(future, name=name)
+        with self._lock:
+            self._tasks.add(task)
+        task.call_on_done(self._on_task_done)
+        return task
+
+    def finalize(self):
+        """
+        Cancel not started calls, wait running calls and destroy interpreters.
+        """
+        with self._lock:
+            if self._finalized:
+                return
+            self._finalized = True
+            tasks, self._tasks = self._tasks, set()
+
+        for task in tasks:
+            task.cancel()
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+    def _on_task_done(self, task : Task):
+        with self._lock:
+            self._tasks.discard(task)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        s = f'[InterpreterThread][{self._name}]'
+        if self._finalized:
+            s += '[FINALIZED]'
+        return s
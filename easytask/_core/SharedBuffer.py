@@ -0,0 +1,190 @@
+from multiprocessing import resource_tracker, shared_memory
+from typing import Dict, List, Tuple
+
+from .lock_profiler import create_lock
+from .Task import Task, get_current_task
+
+
+class SharedBuffer:
+    # buffers of current process by shared memory name, so attach() in the same process doesn't map memory twice
+    _by_name : Dict[str, 'SharedBuffer'] = {}
+    _by_name_lock = create_lock('SharedBuffer._by_name_lock')
+
+    def __init__(self, shm : shared_memory.SharedMemory, size : int, pool : 'SharedBufferPool' = None, owner : bool = True):
+        """
+        Buffer in shared memory. Use SharedBufferPool.acquire() or SharedBuffer.attach(handle).
+
+        Buffer is ref-counted. When last reference is released, buffer is returned to its pool.
+        """
+        self._shm = shm
+        self._size = size
+        self._capacity = shm.size
+        self._pool = pool
+        self._owner = owner
+        self._lock = create_lock('SharedBuffer._lock')
+        self._ref_count = 0
+
+    def get_size(self) -> int: return self._size
+
+    def get_handle(self) -> Tuple[str, int]:
+        """
+        get picklable handle, which can be passed to other Thread or process and attached with SharedBuffer.attach(handle)
+        Receiver must retain the buffer (attach does it) before sender releases it.
+        """
+        return (self._shm.name, self._size)
+
+    @property
+    def buf(self) -> memoryview:
+        """memoryview of the buffer, valid until buffer is released"""
+        return self._shm.buf[:self._size]
+
+    def get_ref_count(self) -> int: return self._ref_count
+
+    def retain(self, task : Task = None) -> 'SharedBuffer':
+        """
+        Add reference to buffer.
+
+            task(None)      release the reference automatically when Task is done.
+                            Default is current Task. Outside of Task you must call release() manually.
+        """
+        with self._lock:
+            self._ref_count += 1
+
+        if task is None:
+            task = get_current_task()
+        if task is not None:
+            task.call_on_done(lambda task, buffer=self: buffer.release())
+        return self
+
+    def release(self):
+        """Remove reference. Last release returns buffer to the pool."""
+        with self._lock:
+            if self._ref_count == 0:
+                raise Exception(f'{self} is already released.')
+            self._ref_count -= 1
+            if self._ref_count != 0:
+                return
+
+        if self._pool is not None:
+            self._pool._on_buffer_released(self)
+        else:
+            self._destroy()
+
+    @staticmethod
+    def attach(handle : Tuple[str, int], task : Task = None) -> 'SharedBuffer':
+        """
+        get SharedBuffer by handle from get_handle() without copying of data, and retain it.
+
+        In the same process returns the same SharedBuffer,
+        in other process maps the shared memory, which is unmapped on last release.
+
+            task(None)      see retain()
+        """
+        name, size = handle
+        with SharedBuffer._by_name_lock:
+            buffer = SharedBuffer._by_name.get(name, None)
+            if buffer is None:
+                shm = shared_memory.SharedMemory(name=name)
+                # segment is owned by creator process, don't unlink it on exit of this process
+                resource_tracker.unregister(shm._name, 'shared_memory')
+                buffer = SharedBuffer._by_name[name] = SharedBuffer(shm, size, owner=False)
+            elif buffer._pool is not None and buffer._ref_count == 0:
+                raise Exception(f'{buffer} is already released.')
+        return buffer.retain(task=task)
+
+    def _destroy(self):
+        with SharedBuffer._by_name_lock:
+            if SharedBuffer._by_name.get(self._shm.name, None) is self:
+                SharedBuffer._by_name.pop(self._shm.name)
+        try:
+            self._shm.close()
+        except BufferError:
+            # memoryviews of the buffer are still alive, mapping is freed with them
+            pass
+        if self._owner:
+            self._shm.unlink()
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        return f'[SharedBuffer][{self._shm.name}][{self._size} bytes][refs: {self._ref_count}]'
+
+
+class SharedBufferPool:
+    _MIN_CAPACITY = 4096
+
+    def __init__(self, max_free_bytes : int = 256*1024*1024):
+        """
+        Pool of SharedBuffer's in shared memory of the process.
+
+        Released buffers are kept for reuse by capacity rounded to power of two,
+        so hot pipelines don't create and map new shared memory on every acquire.
+
+            max_free_bytes      released buffers above this size are destroyed
+        """
+        self._max_free_bytes = max_free_bytes
+        self._lock = create_lock('SharedBufferPool._lock')
+        self._free : Dict[int, List[SharedBuffer]] = {}     # capacity -> buffers
+        self._free_bytes = 0
+        self._used_count = 0
+        self._finalized = False
+
+    def acquire(self, size : int, task : Task = None) -> SharedBuffer:
+        """
+        get SharedBuffer of `size` bytes with reference count 1.
+
+            task(None)      release the reference automatically when Task is done.
+                            Default is current Task. Outside of Task you must call release() manually.
+
+        Content of reused buffer is not cleared.
+        """
+        capacity = SharedBufferPool._MIN_CAPACITY
+        while capacity < size:
+            capacity *= 2
+
+        with self._lock:
+            if self._finalized:
+                raise Exception('SharedBufferPool is finalized.')
+            self._used_count += 1
+            buffers = self._free.get(capacity, None)
+            buffer = buffers.pop() if buffers else None
+            if buffer is not None:
+                self._free_bytes -= capacity
+
+        if buffer is None:
+            shm = shared_memory.SharedMemory(create=True, size=capacity)
+            buffer = SharedBuffer(shm, size, pool=self)
+            buffer._capacity = capacity
+            with SharedBuffer._by_name_lock:
+                SharedBuffer._by_name[shm.name] = buffer
+        else:
+            buffer._size = size
+
+        return buffer.retain(task=task)
+
+    def get_info(self) -> Dict[str, int]:
+        """get counts of used and free buffers and size of free buffers in bytes"""
+        with self._lock:
+            return {'used' : self._used_count,
+                    'free' : sum(len(buffers) for buffers in self._free.values()),
+                    'free_bytes' : self._free_bytes }
+
+    def finalize(self):
+        """Destroy free buffers. Used buffers are destroyed on release."""
+        with self._lock:
+            self._finalized = True
+            free, self._free = self._free, {}
+            self._free_bytes = 0
+
+        for buffers in free.values():
+            for buffer in buffers:
+                buffer._destroy()
+
+    def _on_buffer_released(self, buffer : SharedBuffer):
+        capacity = buffer._capacity
+        with self._lock:
+            self._used_count -= 1
+            if not self._finalized and self._free_bytes + capacity <= self._max_free_bytes:
+                self._free.setdefault(capacity, []).append(buffer)
+                self._free_bytes += capacity
+                return
+        buffer._destroy()
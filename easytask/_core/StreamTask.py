@@ -0,0 +1,63 @@
+from collections import deque
+from typing import Iterator, Tuple, TypeVar
+
+from .Task import Task, get_current_task
+from .Thread import get_current_thread
+
+T = TypeVar('T')
+
+
+class StreamTask(Task[T]):
+    def __init__(self, name : str = None, buffer_size : int = 64):
+        """
+        Task which delivers items incrementally.
+
+        Items are emitted by taskmethod with `yield easytask.yield_emit(item)`
+        and consumed with `yield easytask.yield_next(stream_task)` or blocking `stream_task.iter()`.
+
+        Emitting is suspended while buffer contains `buffer_size` items.
+        """
+        self._buffer = deque()     # single producer, deque.append/popleft are atomic
+        self._buffer_size = buffer_size
+        super().__init__(name=name)
+
+    def get_buffer_size(self) -> int: return self._buffer_size
+    def get_buffered_count(self) -> int: return len(self._buffer)
+
+    def iter(self) -> Iterator[T]:
+        """
+        Block execution and iterate items in current (or automatically registered) easytask.Thread
+        until the Task is done and buffer is empty.
+
+        raises Exception if calling iter() inside Task.
+        """
+        if get_current_task() != None:
+            raise Exception('Unable to .iter() inside Task. Use yield easytask.yield_next(task)')
+
+        thread = get_current_thread()
+        buffer = self._buffer
+
+        while True:
+            thread.execute_tasks_loop(condition=lambda: len(buffer) != 0 or self.is_done())
+
+            is_done = self.is_done()
+            success, item = self._get()
+            if success:
+                yield item
+            elif is_done or thread._finalizing_ev.is_set():
+                break
+
+    def _put(self, item) -> bool:
+        if len(self._buffer) >= self._buffer_size:
+            return False
+        self._buffer.append(item)
+        return True
+
+    def _get(self) -> Tuple[bool, T]:
+        try:
+            return True, self._buffer.popleft()
+        except IndexError:
+            return False, None
+
+    def __str__(self):
+        return f'{super().__str__()}[Buffered: {len(self._buffer)}]'
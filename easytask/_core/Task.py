@@ -1,17 +1,20 @@
 import threading
 from collections import deque
+from concurrent.futures import Future, InvalidStateError
 from enum import Enum
 from typing import Any, Callable, Generic, TypeVar, Union, Iterable
 
+from .lock_profiler import create_rlock
 from .log import get_log_level
+from .TaskRegistry import TaskRegistry
 
 T = TypeVar('T')
 
-from .Thread import get_current_thread
+from .Thread import _find_current_thread
 
 
 class Task(Generic[T]):
-    _active_tasks = set()
+    _active_tasks = TaskRegistry()
 
     class _State(Enum):
         ACTIVE = 0
@@ -21,28 +24,32 @@ class Task(Generic[T]):
     def __init__(self, name : str = None):
         self._name = name
 
-        self._lock = threading.RLock()
-        self._done_lock = threading.RLock()
+        self._lock = create_rlock('Task._lock')
+        self._done_lock = create_rlock('Task._done_lock')
         self._on_done_funcs = deque()      # accessed inside Task._done_lock only
         self._state = Task._State.ACTIVE
         self._executor = None
         self._parent : Task = None
+        self._sched_group = None    # weighted Taskset used for fair scheduling in Thread
 
         Task._active_tasks.add(self)
         
         # prepare Set of unique Taskset where Task should be added
         ts_scope = self._ts_scope = set()
             
-        tls = get_current_thread().get_tls()
-        if len(tls._ts_scope) != 0:
-            # Task created inside one or multiple Taskset.as_scope()
-            ts_scope.update(tls._ts_scope)
-            
-        if len(tls._task_exec_stack) != 0:
-            # Task created inside execution of other Task in current thread
-            # get it's ts_scope and merge
-            parent_task : Task = tls._task_exec_stack[-1]
-            ts_scope.update(parent_task._ts_scope)
+        # OS thread which is not easytask.Thread has no scopes and executed Tasks, it is not registered
+        thread = _find_current_thread()
+        if thread is not None:
+            tls = thread.get_tls()
+            if len(tls._ts_scope) != 0:
+                # Task created inside one or multiple Taskset.as_scope()
+                ts_scope.update(tls._ts_scope)
+
+            if len(tls._task_exec_stack) != 0:
+                # Task created inside execution of other Task in current thread
+                # get it's ts_scope and merge
+                parent_task : Task = tls._task_exec_stack[-1]
+                ts_scope.update(parent_task._ts_scope)
                         
         # add to all Taskset's
         for ts in ts_scope:
@@ -75,18 +82,50 @@ class Task(Generic[T]):
                 return
         func(self)
 
+    def _remove_on_done(self, func : Callable[ ['Task'], None ]):
+        # forget func of call_on_done, which is not needed anymore
+        with self._done_lock:
+            if self._state == Task._State.ACTIVE:
+                try:
+                    self._on_done_funcs.remove(func)
+                except ValueError:
+                    pass
+
     def wait(self):
         """
-        Block execution and wait Task in current (or automatically registered) easytask.Thread
+        Block execution and wait Task.
+
+        In easytask.Thread, Tasks of the Thread are executed while waiting.
+        OS thread which is not easytask.Thread is blocked without polling and is not registered.
+        Note that Task created in such OS thread by taskmethod(thread=None) is executed inline,
+        and that registers the OS thread as easytask.Thread.
 
         raises Exception if calling wait() inside Task.
         """
+        thread = _find_current_thread()
+        if thread is None:
+            done_ev = threading.Event()
+            self.call_on_done(lambda task: done_ev.set())
+            done_ev.wait()
+            return self
+
         if get_current_task() != None:
             raise Exception('Unable to .wait() inside Task. Use yield easytask.wait(task)')
 
-        get_current_thread().execute_tasks_loop(condition=self.is_done)
+        thread.execute_tasks_loop(condition=self.is_done)
         return self
 
+    def as_future(self) -> Future:
+        """
+        get concurrent.futures.Future done with result or exception of the Task.
+
+        Task cancelled without exception cancels the Future. Cancellation of the Future cancels the Task.
+        """
+        future = Future()
+        future.add_done_callback(lambda future, task=self: task.cancel() if future.cancelled() else None)
+        self.call_on_done(lambda task, future=future: Task._set_future_result(task, future))
+        return future
+
     def propagate(self, other_task : 'Task'):
         """
         result of `other_task` will be set as result of this Task on `other_task`'s done.
@@ -168,6 +207,21 @@ class Task(Generic[T]):
 
         return s
 
+    @staticmethod
+    def _set_future_result(task : 'Task', future : Future):
+        try:
+            if task.is_succeeded():
+                future.set_result(task.result())
+            else:
+                exception = task.exception()
+                if exception is not None:
+                    future.set_exception(exception)
+                else:
+                    future.cancel()
+        except InvalidStateError:
+            # Future is cancelled
+            ...
+
     @staticmethod
     def _propagate_task_result(from_task, to_task):
         if from_task.is_succeeded():
@@ -176,7 +230,9 @@ class Task(Generic[T]):
             to_task.cancel(exception=from_task.exception())
 
 def get_current_task() -> Union[Task, None]:
-    current_thread = get_current_thread()
+    current_thread = _find_current_thread()
+    if current_thread is None:
+        return None
     tls = current_thread.get_tls()
     if len(tls._task_exec_stack) != 0:
         return tls._task_exec_stack[-1]
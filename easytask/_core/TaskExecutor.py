@@ -1,49 +1,103 @@
+import inspect
+import time
 import traceback
+from collections import deque
 from types import GeneratorType
+from typing import Union
 
+from . import recorder as recorder_module
 from .exceptions import ETaskDone
+from .lock_profiler import create_lock
 from .log import get_log_level
-from .Task import Task
-from .Thread import get_current_thread
-from .yields import (yield_add_to, yield_cancel, yield_propagate, yield_sleep,
-                     yield_sleep_tick, yield_success, yield_switch_thread,
-                     yield_wait)
+from .StreamTask import StreamTask
+from .Task import Task, get_current_task
+from .Thread import Thread, get_current_thread
+from .yields import (yield_add_to, yield_admit, yield_batch, yield_call,
+                     yield_cancel, yield_emit, yield_next, yield_propagate,
+                     yield_read, yield_read_file, yield_remote, yield_sleep,
+                     yield_sleep_tick, yield_sleep_until, yield_subprocess,
+                     yield_success, yield_switch_thread, yield_wait)
 
 
 class TaskExecutor:
+    _park_lock = create_lock('TaskExecutor._park_lock')
 
-    def __init__(self, task : Task, gen : GeneratorType):
+    def __init__(self, task : Task, gen : GeneratorType, thread : Thread = None):
+        """
+            thread(None)    start execution in the Thread instead of immediately in current thread
+        """
         self._task = task
         self._gen = gen
+        self._gen_stack = deque()   # generators of callers suspended by yield_call
 
         self._continue_execution = True
-        self._current_thread = get_current_thread()
+        self._current_thread = get_current_thread() if thread is None else thread
         self._send_param = None
+        self._throw_param = None
+        self._sleep_deadline = None
+        self._sleeping = False      # Task is in timer heap of _current_thread
+        self._parking = False       # set by yield handler, Task is not queued after the handler
+        self._parked = False        # Task waits for _wake()
         self._yield_value = None
+        self._rec_id = None         # id of the Task in workload recording
+        self._rec_busy = None       # ns of execution of the Task since last recorded yield
+        self._rec_time = None
 
         task._executor = self
         task.call_on_done(self._on_task_done)
 
-        self.exec()
+        recorder = recorder_module._RECORDER
+        if recorder is not None:
+            recorder._on_spawn(self, get_current_task())
+
+        if thread is None:
+            if Thread._watched:
+                self._current_thread._exec_watched(task)
+            else:
+                self.exec()
+        elif not thread._add_task(task):
+            task.cancel()
 
     def _on_task_done(self, task : Task):
+        if self._sleeping:
+            # let the Thread drop cancelled Task from timer heap
+            self._sleeping = False
+            self._current_thread._cancelled_timers += 1
+
         if self._gen is not None:
-            try:
-                self._gen.throw( ETaskDone(self._task) )
-            except Exception as e:
-                ...
-            self._gen.close()
+            # from innermost yield_call to the Task's generator
+            gen_stack = self._gen_stack
+            gen_stack.append(self._gen)
             self._gen = None
 
+            while len(gen_stack) != 0:
+                gen = gen_stack.pop()
+                try:
+                    gen.throw( ETaskDone(self._task) )
+                except Exception as e:
+                    ...
+                gen.close()
+
+    def get_thread(self) -> Thread:
+        """Thread where the Task is executed"""
+        return self._current_thread
+
+    def is_started(self) -> bool:
+        """generator of the Task was resumed at least once and is not finished"""
+        gen = self._gen
+        return gen is not None and inspect.getgeneratorstate(gen) != inspect.GEN_CREATED
+
     def exec(self):
         task = self._task
 
         with task._lock:
             if task._state != Task._State.ACTIVE:
                 return
+            self._sleeping = False
 
             current_thread = get_current_thread()
             tls = current_thread.get_tls()
+            recorder = recorder_module._RECORDER
 
             # add Task to ThreadLocalStorage Task execution stack
             tls._task_exec_stack.append(task)
@@ -51,19 +105,41 @@ class TaskExecutor:
             while True:
 
                 if self._continue_execution:
+                    current_thread._tick_busy = True
+                    if recorder is not None:
+                        time_send = time.perf_counter_ns()
                     try:
-                        self._yield_value = self._gen.send(self._send_param) if self._send_param is not None else next(self._gen)
-                        self._send_param = None
+                        if self._throw_param is not None:
+                            exception, self._throw_param = self._throw_param, None
+                            self._yield_value = self._gen.throw(exception)
+                        else:
+                            self._yield_value = self._gen.send(self._send_param) if self._send_param is not None else next(self._gen)
+                            self._send_param = None
                     except StopIteration as e:
+                        if len(self._gen_stack) != 0:
+                            # yield_call returns value, continue the caller
+                            self._gen = self._gen_stack.pop()
+                            self._send_param = e.value
+                            continue
+
                         # Method returns value directly
                         task.success(e.value)
                         break
                     except Exception as e:
+                        if len(self._gen_stack) != 0:
+                            # Unhandled exception in yield_call, raise it in the caller
+                            self._gen = self._gen_stack.pop()
+                            self._throw_param = e
+                            continue
+
                         # Unhandled exception
                         if get_log_level() >= 1:
                             print(f'Unhandled exception {e} occured during execution of task {task}. Traceback:\n{traceback.format_exc()}')
                         task.cancel(exception=e)
                         break
+                    finally:
+                        if recorder is not None:
+                            recorder._on_send(self, time_send)
 
                 # Process yield value
                 yield_func = TaskExecutor._yield_to_func.get(self._yield_value.__class__, None)
@@ -76,18 +152,56 @@ class TaskExecutor:
 
                 if task.is_done():
                     break
+                elif self._parking:
+                    # Task is queued by _wake(), which may be already called
+                    self._parking = False
+                    break
                 elif not self._continue_execution:
                     # Task still active, assign to Thread.
-                    if self._current_thread is not None and \
-                       not self._current_thread._add_task(task):
-                        # Unable to add Task to Thread, finalized or other reason, cancel without exception
-                        task.cancel()
+                    if self._current_thread is not None:
+                        if self._sleep_deadline is not None:
+                            # Sleeping Task is not executed until deadline
+                            deadline, self._sleep_deadline = self._sleep_deadline, None
+                            added = self._sleeping = self._current_thread._add_timer(deadline, task)
+                        else:
+                            added = self._current_thread._add_task(task)
+
+                        if not added:
+                            # Unable to add Task to Thread, finalized or other reason, cancel without exception
+                            task.cancel()
                     break
 
+            if recorder is not None:
+                recorder._on_leave(self, current_thread)
+
             # remove Task from ThreadLocalStorage Task execution stack
             tls._task_exec_stack.pop()
 
 
+    def _park(self):
+        """
+        Suspend Task in yield handler without queueing it to Thread,
+        until someone calls _wake() from any thread.
+        """
+        self._parking = True
+        self._parked = True
+
+    def _wake(self, send_param = None, throw_param : Exception = None):
+        """
+        Resume parked Task in its Thread with value or exception of the yield.
+        Repeated calls are ignored.
+        """
+        with TaskExecutor._park_lock:
+            if not self._parked:
+                return
+            self._parked = False
+
+        self._send_param = send_param
+        self._throw_param = throw_param
+        self._continue_execution = True
+        if not self._current_thread._add_task(self._task):
+            self._task.cancel()
+
     def _on_yield_add_to(self, yield_value : yield_add_to):
         task = self._task
 
@@ -97,6 +211,83 @@ class TaskExecutor:
             task.cancel()
             self._continue_execution = False
 
+    def _on_yield_admit(self, yield_value : yield_admit):
+        yield_value._limiter._admit(self)
+
+    def _on_yield_batch(self, yield_value : yield_batch):
+        self._park()
+        yield_value._batcher._add(self, yield_value._item)
+
+    def _on_yield_call(self, yield_value : yield_call):
+        self._continue_execution = True
+        try:
+            result = yield_value._func(*yield_value._args, **yield_value._kwargs)
+        except Exception as e:
+            self._throw_param = e
+            return
+
+        if isinstance(result, GeneratorType):
+            self._gen_stack.append(self._gen)
+            self._gen = result
+        else:
+            self._send_param = result
+
+    def _on_yield_emit(self, yield_value : yield_emit):
+        task = self._task
+        if not isinstance(task, StreamTask):
+            print(f'{task} yield_emit is allowed only in StreamTask.')
+            task.cancel()
+            self._continue_execution = False
+            return
+
+        self._continue_execution = task._put(yield_value._item)
+
+    def _on_yield_next(self, yield_value : yield_next):
+        stream_task : StreamTask = yield_value._task
+
+        is_done = stream_task.is_done()
+        success, item = stream_task._get()
+        if success:
+            self._send_param = item
+            self._continue_execution = True
+        elif is_done:
+            self._send_param = yield_value._default
+            self._continue_execution = True
+        else:
+            self._continue_execution = False
+
+    def _on_yield_read(self, yield_value : yield_read):
+        yield_value._reader._read(self)
+
+    # handlers of optional features import their modules on first use,
+    # so programs which don't use them don't load socket, pickle, subprocess and selectors
+
+    def _on_yield_read_file(self, yield_value : yield_read_file):
+        from .FileReader import _get_io_pool, _read_file
+        self._park()
+        _get_io_pool().submit(lambda: _read_file(self, yield_value._path, yield_value._offset, yield_value._size))
+
+    def _on_yield_remote(self, yield_value : yield_remote):
+        self._park()
+        call_task = yield_value._coordinator.call(yield_value._name, *yield_value._args, **yield_value._kwargs)
+        self._task.call_on_done(lambda task, call_task=call_task: call_task.cancel())
+        call_task.call_on_done(self._on_remote_call_done)
+
+    def _on_remote_call_done(self, call_task : Task):
+        if call_task.is_succeeded():
+            self._wake(send_param=call_task.result())
+        else:
+            exception = call_task.exception()
+            self._wake(throw_param=exception if exception is not None else Exception(f'{call_task} is cancelled.'))
+
+    def _on_yield_subprocess(self, yield_value : yield_subprocess):
+        from .process import _get_reactor, _Process
+        self._park()
+        reactor = _get_reactor()
+        process = _Process(self, yield_value)
+        self._task.call_on_done(lambda task, process=process: reactor.cancel(process))
+        reactor.submit(process)
+
     def _on_yield_switch_thread(self, yield_value : yield_switch_thread):
         if self._current_thread.get_ident() == yield_value._thread.get_ident():
             self._continue_execution = True
@@ -127,20 +318,31 @@ class TaskExecutor:
             self._continue_execution = False
             yield_value.remain_ticks -= 1
 
-    def _on_yield_sleep(self, yield_value : yield_sleep):
-        if yield_value._sec == 0 or yield_value.is_done():
+    def _on_yield_sleep(self, yield_value : Union[yield_sleep, yield_sleep_until]):
+        if yield_value.is_done():
             self._continue_execution = True
         else:
             self._continue_execution = False
+            self._sleep_deadline = yield_value._deadline
 
 
     _yield_to_func = {
             yield_add_to : _on_yield_add_to,
+            yield_admit : _on_yield_admit,
+            yield_batch : _on_yield_batch,
+            yield_call : _on_yield_call,
+            yield_read : _on_yield_read,
+            yield_read_file : _on_yield_read_file,
+            yield_remote : _on_yield_remote,
+            yield_subprocess : _on_yield_subprocess,
             yield_switch_thread : _on_yield_switch_thread,
             yield_wait : _on_yield_wait,
             yield_success : _on_yield_success,
             yield_cancel : _on_yield_cancel,
+            yield_emit : _on_yield_emit,
+            yield_next : _on_yield_next,
             yield_propagate : _on_yield_propagate,
             yield_sleep_tick : _on_yield_sleep_tick,
             yield_sleep : _on_yield_sleep,
+            yield_sleep_until : _on_yield_sleep,
         }
@@ -0,0 +1,84 @@
+import threading
+import time
+import weakref
+from collections import deque
+from typing import List, Tuple
+
+
+class _TaskRef(weakref.ref):
+    __slots__ = ('_key', '_created_time')
+
+
+class _Shard:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._refs = {}     # id(task) -> _TaskRef
+        self._dead = deque()    # _TaskRef of collected Tasks, removed from _refs under the lock
+
+    def _drain_dead(self):
+        # inside self._lock
+        dead, refs = self._dead, self._refs
+        while len(dead) != 0:
+            ref = dead.popleft()
+            if refs.get(ref._key, None) is ref:
+                del refs[ref._key]
+
+
+class TaskRegistry:
+    _track_created_time = False     # set by leak detector
+
+    def __init__(self, shards_count : int = 64):
+        """
+        Thread-safe registry of active Tasks.
+
+        Tasks are referenced weakly, so abandoned Tasks with their generators are freed
+        instead of staying in the registry forever.
+
+        Registry is split into shards with own locks by Task id,
+        so threads adding and removing different Tasks rarely contend without GIL.
+        """
+        self._shards = tuple( _Shard() for _ in range(shards_count) )
+
+    def add(self, task):
+        ref = _TaskRef(task, self._on_ref_dead)
+        ref._key = key = id(task)
+        ref._created_time = time.monotonic() if TaskRegistry._track_created_time else None
+
+        shard = self._get_shard(key)
+        with shard._lock:
+            shard._drain_dead()
+            shard._refs[key] = ref
+
+    def remove(self, task):
+        key = id(task)
+        shard = self._get_shard(key)
+        with shard._lock:
+            shard._drain_dead()
+            shard._refs.pop(key, None)
+
+    def get_tasks(self) -> List:
+        return [ task for task, _ in self._get_tasks() ]
+
+    def get_tasks_with_created_time(self) -> List[Tuple[object, float]]:
+        """get (Task, created time.monotonic()) of Tasks created while tracking of created time is enabled"""
+        return [ (task, created_time) for task, created_time in self._get_tasks() if created_time is not None ]
+
+    def _get_tasks(self) -> List[Tuple[object, float]]:
+        refs = []
+        for shard in self._shards:
+            with shard._lock:
+                shard._drain_dead()
+                refs.extend(shard._refs.values())
+        return [ (task, ref._created_time) for task, ref in ((ref(), ref) for ref in refs) if task is not None ]
+
+    def _get_shard(self, key : int) -> _Shard:
+        # low bits of id are always zero due to alignment
+        return self._shards[ (key >> 4) % len(self._shards) ]
+
+    def _on_ref_dead(self, ref : _TaskRef):
+        # called by GC at any point, possibly while this thread holds the shard lock,
+        # so the ref is only queued without locking
+        self._get_shard(ref._key)._dead.append(ref)
+
+    def __len__(self):
+        return sum( len(shard._refs) - len(shard._dead) for shard in self._shards )
@@ -1,7 +1,8 @@
 import threading
 from collections import deque
-from typing import Deque, Generic, TypeVar
+from typing import Deque, Generic, TypeVar, Union
 
+from .lock_profiler import create_rlock
 from .log import get_log_level
 from .Thread import get_current_thread
 from .Task import Task
@@ -24,14 +25,22 @@ class Taskset(Generic[T]):
         def __repr__(self): return self.__str__()
         def __str__(self): return f'[Taskset.Scope] with {self._ts}'
         
-    def __init__(self, name : str = None):
+    def __init__(self, name : str = None, weight : float = None):
         """
         Provides a set of Tasks.
 
         Tasks can be registered/unregistered/cancelled/fetched in/from Taskset from any thread safely.
+
+            weight(None)    float   if specified, Taskset is a scheduling group of added Tasks
+                                    in Thread's with fair scheduling (easytask.Thread(fair=True)).
+                                    Task belongs to the first weighted Taskset it was added to.
+                                    Must be positive.
         """
+        if weight is not None and weight <= 0:
+            raise ValueError(f'weight must be positive, got {weight}.')
         self._name = name
-        self._lock = threading.RLock()
+        self._weight = weight
+        self._lock = create_rlock('Taskset._lock')
         self._tasks = set()
 
     def finalize(self):
@@ -53,10 +62,20 @@ class Taskset(Generic[T]):
         return 0 if tasks is None else len(tasks)
 
     def get_name(self) -> str: return self._name
+    def get_weight(self) -> Union[float, None]: return self._weight
+    def set_weight(self, weight : float):
+        """change weight of already weighted Taskset"""
+        if self._weight is None:
+            raise Exception(f'{self} is not weighted.')
+        if weight <= 0:
+            raise ValueError(f'weight must be positive, got {weight}.')
+        self._weight = weight
+
     def is_empty(self): return len(self._tasks) == 0
+    def is_finalized(self) -> bool: return self._tasks is None
 
     def cancel_all(self):
-        """Cancel all current active tasks in Taskset"""
+        """Cancel all current active tasks in Taskset. Tasks are done when the method returns."""
         with self._lock:
             tasks, self._tasks = self._tasks, set()
 
@@ -67,6 +86,60 @@ class Taskset(Generic[T]):
         for task in tasks:
             task.cancel()
 
+    def cancel_all_deferred(self) -> Task:
+        """
+        Cancel all current active tasks in Taskset, and return Task which succeeds when they are done.
+
+        Tasks, which are executed by other easytask.Thread's, are cancelled in their Threads on next tick
+        by single request per Thread, so ETaskDone and cleanup of generators run in the Thread of the Task,
+        instead of contending for Tasks with the Thread, and the caller is not blocked by the cleanup.
+        Tasks which are not started, or executed in current OS thread, are cancelled immediately.
+        """
+        with self._lock:
+            tasks, self._tasks = self._tasks, set()
+
+        if len(tasks) != 0:
+            if get_log_level() >= 2:
+                print(f'Cancelling {len(tasks)} tasks in {self._name} Taskset.')
+
+        done_task = Task(name=f'{self} cancel_all_deferred')
+        remain = [len(tasks)]
+        lock = threading.Lock()
+        def on_done(task):
+            with lock:
+                remain[0] -= 1
+                all_done = remain[0] == 0
+            if all_done:
+                done_task.success()
+
+        if len(tasks) == 0:
+            done_task.success()
+        for task in tasks:
+            task.call_on_done(on_done)
+
+        ident = threading.get_ident()
+        tasks_by_thread = {}
+        for task in tasks:
+            executor = task._executor
+            thread = executor.get_thread() if executor is not None else None
+            if thread is None or not thread.is_created() or thread.get_ident() == ident:
+                task.cancel()
+            elif not executor.is_started():
+                # done or not started Task
+                task.cancel()
+            else:
+                thread_tasks = tasks_by_thread.get(thread, None)
+                if thread_tasks is None:
+                    thread_tasks = tasks_by_thread[thread] = []
+                thread_tasks.append(task)
+
+        for thread, thread_tasks in tasks_by_thread.items():
+            if not thread._cancel_tasks(thread_tasks):
+                for task in thread_tasks:
+                    task.cancel()
+
+        return done_task
+
 
     def add(self, task : Task[T], remove_on_done=False) -> bool:
         """add Task, returns True if success"""
@@ -81,6 +154,9 @@ class Taskset(Generic[T]):
                         if remove_on_done:
                             task.call_on_done(self.remove)
 
+                        if self._weight is not None and task._sched_group is None:
+                            task._sched_group = self
+
                         return True
         return False
 
@@ -136,6 +212,8 @@ class Taskset(Generic[T]):
         s = '[Taskset]'
         if self._name is not None:
             s += f'[{self._name}]'
+        if self._weight is not None:
+            s += f'[Weight: {self._weight}]'
         tasks = self._tasks
         if tasks is not None:
             s += f'[{len(self._tasks)} tasks]'
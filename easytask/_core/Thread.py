@@ -1,28 +1,103 @@
+import glob
+import heapq
 import itertools
+import os
 import threading
 import time
+import weakref
 from collections import deque
-from typing import Callable, Dict, Union
+from typing import Callable, Dict, Iterable, List, Set, Tuple, Union
 
+from . import clock as clock_module
+from .clock import Clock
+from .lock_profiler import create_lock
 from .log import get_log_level
 from .ThreadLocalStorage import ThreadLocalStorage
 
 
+class _SchedGroup:
+    def __init__(self, taskset_ref):
+        # Group of Tasks of weighted Taskset (or default group if None) in fair mode of Thread.
+        # Queued Tasks keep the Taskset alive, empty group of dropped Taskset is forgotten.
+        self._taskset_ref = taskset_ref
+        self._tasks = deque()
+        self._queued_times = deque()    # perf_counter() when the Tasks were queued, for watchdog
+        self._deficit = 0.0
+        self._cpu_time = 0.0
+
+    def get_taskset(self):
+        return self._taskset_ref() if self._taskset_ref is not None else None
+
+    def get_weight(self) -> float:
+        taskset = self.get_taskset()
+        return taskset.get_weight() if taskset is not None else 1.0
+
+
+_TIMERS_COMPACT_MIN_CANCELLED = 64
+
 class Thread:
+    _FAIR_QUANTUM = 0.001   # CPU time per unit of weight given to a scheduling group every round
+    _FAIR_TICK = 0.005      # new rounds are not started after this CPU time of the tick
+
+    _watched = False        # set by watchdog, Threads record execution of Tasks
+
     _by_ident : Dict[int, 'Thread'] = {}
+    _by_ident_lock = threading.Lock()       # guards mutation of Thread._by_ident, ThreadLocalStorage._by_ident and _unnamed_counter
     _unnamed_counter = itertools.count()
 
-    def __init__(self, name : str = None, **kwargs):
+    def __init__(self, name : str = None, clock : Clock = None, fair : bool = False, cpu_affinity : Iterable[int] = None, **kwargs):
         """
         Create easytask.Thread
-        """
 
-        self._name = name if name is not None else f'Unnamed #{next(Thread._unnamed_counter)}'
+            clock(None)     Clock   clock of the Thread, default is global easytask.get_clock()
+
+            fair(False)     bool    fair scheduling between Tasks of weighted Taskset's (easytask.Taskset(weight=...)).
+                                    Tasks are executed with deficit round robin by CPU time proportional to weight,
+                                    so a Taskset with many Tasks can't starve others.
+                                    Tasks outside weighted Taskset's are in default group with weight 1.0.
+
+            cpu_affinity(None)  Iterable[int]   pin OS thread of the Thread to the CPUs (os.sched_setaffinity),
+                                                keeping caches of data owned by the Thread warm.
+                                                See also create_pinned_threads().
+        """
+        if cpu_affinity is not None:
+            if not hasattr(os, 'sched_setaffinity'):
+                raise Exception('cpu_affinity is not supported on this platform.')
+            cpu_affinity = frozenset(cpu_affinity)
+            if len(cpu_affinity) == 0 or not cpu_affinity.issubset(os.sched_getaffinity(0)):
+                raise Exception(f'cpu_affinity {sorted(cpu_affinity)} must be non-empty subset of available CPUs {sorted(os.sched_getaffinity(0))}.')
+
+        if name is None:
+            with Thread._by_ident_lock:
+                name = f'Unnamed #{next(Thread._unnamed_counter)}'
+        self._name = name
+        self._clock = clock
+        self._cpu_affinity = cpu_affinity
         self._created = create = not kwargs.get('register', False)
-        self._lock = threading.Lock()
+        self._lock = create_lock('Thread._lock')
         self._active_tasks_ev = threading.Event()
         self._active_tasks = deque()
 
+        self._timers = []               # heap of (deadline, id, Task), accessed inside the Thread only
+        self._new_timers = deque()      # (deadline, Task) added from any thread, merged into heap every tick
+        self._timer_counter = itertools.count()     # accessed inside the Thread only
+        self._cancelled_timers = 0      # approximate count of Tasks cancelled while sleeping in the heap
+
+        self._tick_busy = False         # some Task generator was resumed during current tick
+
+        self._cancel_requests = deque()     # Tasks cancelled from other threads, cancelled inside the Thread
+
+        # execution state for watchdog
+        self._exec_task = None          # Task currently executed
+        self._exec_start = 0.0          # perf_counter() when execution of _exec_task started
+        self._queue_since = None        # perf_counter() when first Task was added since last fetch
+        self._fair_queue_since = None   # perf_counter() when oldest Task in scheduling groups was queued
+        self._fair_queued_count = 0     # Tasks in scheduling groups
+        self._history = deque(maxlen=32)    # (perf_counter() of start, duration, Task name) of last executions
+
+        self._fair = fair
+        self._sched_groups : Dict[object, _SchedGroup] = {}     # weakref of Taskset/None -> _SchedGroup, accessed inside the Thread only
+
         self._finalizing_ev = threading.Event()
         self._finalized_ev = threading.Event()
 
@@ -35,6 +110,8 @@ class Thread:
             self._t.start()
         else:
             self._t = None
+            # pinned before the Thread is registered and Tasks can be added to it
+            self._apply_cpu_affinity()
             self._initialize_thread(threading.get_ident())
 
     def finalize(self):
@@ -74,12 +151,62 @@ class Thread:
         return self._created
 
     def get_active_tasks(self):
+        """get Tasks scheduled to execute in the Thread, including sleeping Tasks"""
+        tasks = deque()
         active_tasks = self._active_tasks
-        return deque(active_tasks) if active_tasks is not None else deque()
+        if active_tasks is not None:
+            tasks.extend(active_tasks)
+        new_timers = self._new_timers
+        if new_timers is not None:
+            tasks.extend( timer[1] for timer in tuple(new_timers) if not timer[1].is_done() )
+        # cancelled sleeping Tasks stay in the heap until their deadline or compaction
+        tasks.extend( timer[2] for timer in tuple(self._timers) if not timer[2].is_done() )
+        for sched_group in tuple(self._sched_groups.values()):
+            tasks.extend(tuple(sched_group._tasks))
+        return tasks
+
+    def _get_load(self) -> int:
+        # O(1) estimate of get_active_tasks_count(), Tasks cancelled while sleeping are subtracted by count
+        load = max(0, len(self._timers) - self._cancelled_timers) + self._fair_queued_count
+        for queue in (self._active_tasks, self._new_timers):
+            if queue is not None:
+                load += len(queue)
+        return load
 
     def get_active_tasks_count(self) -> int:
+        count = sum( 1 for timer in tuple(self._timers) if not timer[2].is_done() )
+        new_timers = self._new_timers
+        if new_timers is not None:
+            count += sum( 1 for timer in tuple(new_timers) if not timer[1].is_done() )
         active_tasks = self._active_tasks
-        return len(active_tasks) if active_tasks is not None else 0
+        if active_tasks is not None:
+            count += len(active_tasks)
+        for sched_group in tuple(self._sched_groups.values()):
+            count += len(sched_group._tasks)
+        return count
+
+    def get_sched_groups_info(self) -> List[Tuple[object, float, int, float]]:
+        """
+        get scheduling groups of fair Thread
+
+        returns list of (Taskset or None for default group, weight, count of queued Tasks, total CPU time of Tasks in seconds)
+        """
+        info = []
+        for sched_group in tuple(self._sched_groups.values()):
+            taskset = sched_group.get_taskset()
+            if taskset is not None or sched_group._taskset_ref is None:
+                info.append( (taskset, sched_group.get_weight(), len(sched_group._tasks), sched_group._cpu_time) )
+        return info
+
+    def is_fair(self) -> bool: return self._fair
+
+    def get_cpu_affinity(self) -> Union[Set[int], None]:
+        """get CPUs the Thread is pinned to, or None"""
+        return set(self._cpu_affinity) if self._cpu_affinity is not None else None
+
+    def get_clock(self) -> Clock:
+        clock = self._clock
+        return clock if clock is not None else clock_module.get_clock()
 
     def get_ident(self) -> int: return self._ident
     def get_name(self): return self._name
@@ -93,15 +220,110 @@ class Thread:
         if threading.get_ident() != self._ident:
             raise Exception('execute_tasks_once must be called from OS thread where the Thread was created/registered.')
 
+        cancel_requests = self._cancel_requests
+        if cancel_requests is not None and len(cancel_requests) != 0:
+            popleft = cancel_requests.popleft
+            for _ in range(len(cancel_requests)):
+                popleft().cancel()
+
+        if self._fair:
+            self._execute_tasks_fair()
+            return
+
+        if Thread._watched:
+            for tasks in (self._fetch_due_timers(), self._fetch_active_tasks()):
+                for task in tasks:
+                    self._exec_watched(task)
+            return
+
+        for task in self._fetch_due_timers():
+            task._exec()
+
         for task in self._fetch_active_tasks():
             task._exec()
 
+    def _exec_watched(self, task):
+        # Task may be started inside execution of other Task
+        prev_task, prev_start = self._exec_task, self._exec_start
+        self._exec_task = task
+        self._exec_start = time_start = time.perf_counter()
+        try:
+            task._exec()
+        finally:
+            self._exec_task, self._exec_start = prev_task, prev_start
+            self._history.append( (time_start, time.perf_counter() - time_start, task.get_name()) )
+
+    def _execute_tasks_fair(self):
+        sched_groups = self._sched_groups
+        time_now = time.perf_counter()
+        queue_since = self._queue_since
+        for tasks, time_queued in ( (self._fetch_due_timers(), time_now),
+                                    (self._fetch_active_tasks(), queue_since if queue_since is not None else time_now) ):
+            for task in tasks:
+                taskset = task._sched_group
+                taskset_ref = weakref.ref(taskset) if taskset is not None else None
+                sched_group = sched_groups.get(taskset_ref, None)
+                if sched_group is None:
+                    sched_group = sched_groups[taskset_ref] = _SchedGroup(taskset_ref)
+                sched_group._tasks.append(task)
+                sched_group._queued_times.append(time_queued)
+
+        self._update_fair_queue_info()
+
+        # Deficit round robin by CPU time
+        watched = Thread._watched
+        perf_counter = time.perf_counter
+        time_start = perf_counter()
+        active_groups = [ sched_group for sched_group in sched_groups.values() if len(sched_group._tasks) != 0 ]
+        while len(active_groups) != 0 and perf_counter() - time_start < Thread._FAIR_TICK:
+            for sched_group in active_groups:
+                sched_group._deficit += sched_group.get_weight() * Thread._FAIR_QUANTUM
+
+                tasks = sched_group._tasks
+                while len(tasks) != 0 and sched_group._deficit > 0.0:
+                    task = tasks.popleft()
+                    sched_group._queued_times.popleft()
+                    time_exec_start = perf_counter()
+                    if watched:
+                        self._exec_watched(task)
+                    else:
+                        task._exec()
+                    time_exec = perf_counter() - time_exec_start
+                    sched_group._deficit -= time_exec
+                    sched_group._cpu_time += time_exec
+
+                if len(tasks) == 0:
+                    sched_group._deficit = 0.0
+
+            active_groups = [ sched_group for sched_group in active_groups if len(sched_group._tasks) != 0 ]
+
+        # Tasks left for next ticks are still waiting
+        self._update_fair_queue_info()
+
+        # forget empty groups of finalized or dropped Taskset's
+        for taskset_ref, sched_group in tuple(sched_groups.items()):
+            if taskset_ref is not None and len(sched_group._tasks) == 0:
+                taskset = taskset_ref()
+                if taskset is None or taskset.is_finalized():
+                    sched_groups.pop(taskset_ref)
+
+    def _update_fair_queue_info(self):
+        sched_groups = self._sched_groups.values()
+        self._fair_queue_since = min( (sched_group._queued_times[0] for sched_group in sched_groups if len(sched_group._queued_times) != 0),
+                                      default=None )
+        self._fair_queued_count = sum( len(sched_group._tasks) for sched_group in sched_groups )
+
     def execute_tasks_loop(self, condition : Callable[[], bool] = None):
         """
         Execute active tasks in loop until Thread finalize or condition() is True
 
             condition(None)     Callable    called every tick once to check if exit from loop is needed.
         """
+        clock = self.get_clock()
+        if clock.is_virtual():
+            self._execute_tasks_loop_virtual(clock, condition)
+            return
+
         time_since_last_sleep = time.perf_counter()
 
         while not self._finalizing_ev.is_set():
@@ -122,52 +344,202 @@ class Thread:
                 time_to_sleep = max(time_to_sleep, 0.005-time_exec)
 
             if time_to_sleep != 0.0:
-                time.sleep(time_to_sleep)
+                active_tasks = self._active_tasks
+                if active_tasks is not None and len(active_tasks) == 0:
+                    # Nothing to execute, wake up as soon as a Task is switched to this Thread or nearest timer is due
+                    next_deadline = self._get_next_deadline()
+                    if next_deadline is not None:
+                        time_to_sleep = min(time_to_sleep, max(0.0, next_deadline - clock.time()))
+                    self._active_tasks_ev.wait(time_to_sleep)
+                else:
+                    time.sleep(time_to_sleep)
                 time_since_last_sleep = time.perf_counter()
 
 
+    def _execute_tasks_loop_virtual(self, clock, condition):
+        clock._attach(self)
+        try:
+            while not self._finalizing_ev.is_set():
+
+                if condition is not None and condition():
+                    break
+
+                self._tick_busy = False
+
+                self.execute_tasks_once()
+
+                clock._tick_thread(self, self._tick_busy, self._get_next_deadline())
+        finally:
+            clock._detach(self)
+
     def _thread_func(self):
+        self._apply_cpu_affinity()
         self._initialize_thread(threading.get_ident())
         self.execute_tasks_loop()
         self._finalize_thread()
 
+    def _apply_cpu_affinity(self):
+        if self._cpu_affinity is not None:
+            # pid 0 is the calling OS thread
+            os.sched_setaffinity(0, self._cpu_affinity)
+
     def _initialize_thread(self, ident):
-        if ident in Thread._by_ident:
-            raise Exception(f'Thread {ident} is already registered.')
+        with Thread._by_ident_lock:
+            if ident in Thread._by_ident:
+                raise Exception(f'Thread {ident} is already registered.')
 
-        self._ident = ident
-        Thread._by_ident[ident] = self
-        ThreadLocalStorage._by_ident[ident] = ThreadLocalStorage()
+            self._ident = ident
+            ThreadLocalStorage._by_ident[ident] = ThreadLocalStorage()
+            Thread._by_ident[ident] = self
 
         if get_log_level() >= 2:
             print(f"{('Initialized'):12} {self}")
 
     def _finalize_thread(self):
         # Cancel remaining tasks registered in thread.
+        cancel_requests, self._cancel_requests = self._cancel_requests, None
+        for task in cancel_requests:
+            task.cancel()
         for task in self._fetch_active_tasks(finalize=True):
             task.cancel()
-        Thread._by_ident.pop(self._ident)
-        ThreadLocalStorage._by_ident.pop(self._ident)
+        for task in self._fetch_due_timers(finalize=True):
+            task.cancel()
+        sched_groups, self._sched_groups = self._sched_groups, {}
+        for sched_group in sched_groups.values():
+            for task in sched_group._tasks:
+                task.cancel()
+        with Thread._by_ident_lock:
+            Thread._by_ident.pop(self._ident)
+            ThreadLocalStorage._by_ident.pop(self._ident)
         self._finalized_ev.set()
 
         if get_log_level() >= 2:
             print(f"{('Finalized'):12} {self}")
 
     def _add_task(self, task) -> bool:
-        with self._lock:
-            if self._active_tasks is None:
-                return False
-            self._active_tasks.append(task)
-            self._active_tasks_ev.set()
-            return True
+        # Multi-producer/single-consumer handoff without Thread._lock:
+        # deque.append and deque.popleft are atomic, so producers only touch the deque
+        # and the consumer drains it by count.
+        active_tasks = self._active_tasks
+        if active_tasks is None:
+            return False
+        active_tasks.append(task)
+
+        if self._active_tasks is None:
+            # Thread finalized concurrently, the finalizer may have drained the deque before append.
+            return False
+
+        # Batched wakeup: only first producer after the fetch pays for Event.set()
+        active_tasks_ev = self._active_tasks_ev
+        if not active_tasks_ev.is_set():
+            self._queue_since = time.perf_counter()
+            active_tasks_ev.set()
+        return True
 
     def _fetch_active_tasks(self, finalize=False):
-        if self._active_tasks_ev.is_set() or finalize:
-            with self._lock:
-                tasks, self._active_tasks = self._active_tasks, (None if finalize else deque())
-                self._active_tasks_ev.clear()
-            return tasks
-        return ()
+        active_tasks = self._active_tasks
+        if active_tasks is None:
+            return ()
+
+        if finalize:
+            self._active_tasks = None
+        elif self._active_tasks_ev.is_set():
+            # clear before drain, so producers appending after the drain will set it again
+            self._active_tasks_ev.clear()
+            self._queue_since = None
+        else:
+            return ()
+
+        popleft = active_tasks.popleft
+        return [ popleft() for _ in range(len(active_tasks)) ]
+
+    def _cancel_tasks(self, tasks) -> bool:
+        """
+        Request cancellation of Tasks executed by the Thread, Tasks are cancelled by the Thread in next tick.
+        Can be called from any thread. Returns False if the Thread is finalized.
+        """
+        cancel_requests = self._cancel_requests
+        if cancel_requests is None:
+            return False
+        cancel_requests.extend(tasks)
+
+        if self._cancel_requests is None:
+            # Thread finalized concurrently
+            return False
+
+        self._active_tasks_ev.set()
+        return True
+
+    def _add_timer(self, deadline : float, task) -> bool:
+        """
+        Schedule `task._exec()` in the Thread when Thread's clock reaches `deadline`.
+        Can be called from any thread.
+        """
+        new_timers = self._new_timers
+        if new_timers is None:
+            return False
+        new_timers.append( (deadline, task) )
+
+        if self._new_timers is None:
+            # Thread finalized concurrently
+            return False
+        return True
+
+    def _fetch_due_timers(self, finalize=False):
+        new_timers = self._new_timers
+        if new_timers is None:
+            return ()
+        if finalize:
+            self._new_timers = None
+
+        timers = self._timers
+        timer_counter = self._timer_counter
+        popleft = new_timers.popleft
+        for _ in range(len(new_timers)):
+            deadline, task = popleft()
+            # unique id keeps order of equal deadlines and Task's are never compared
+            heapq.heappush(timers, (deadline, next(timer_counter), task))
+
+        if self._cancelled_timers >= _TIMERS_COMPACT_MIN_CANCELLED and self._cancelled_timers*2 >= len(timers):
+            # drop cancelled Tasks, so the heap doesn't keep them until deadlines of long sleeps
+            timers_count = len(timers)
+            timers = self._timers = [ timer for timer in timers if not timer[2].is_done() ]
+            heapq.heapify(timers)
+            self._cancelled_timers = max(0, self._cancelled_timers - (timers_count - len(timers)))
+
+        if finalize:
+            self._timers = []
+            return [ timer[2] for timer in timers ]
+
+        if len(timers) == 0:
+            return ()
+
+        now = self.get_clock().time()
+        due_tasks = []
+        while len(timers) != 0 and timers[0][0] <= now:
+            task = heapq.heappop(timers)[2]
+            if task.is_done():
+                # cancelled while sleeping
+                self._cancelled_timers = max(0, self._cancelled_timers - 1)
+            due_tasks.append(task)
+        return due_tasks
+
+    def _get_next_deadline(self) -> Union[float, None]:
+        timers = self._timers
+        deadline = timers[0][0] if len(timers) != 0 else None
+
+        new_timers = self._new_timers
+        if new_timers is not None and len(new_timers) != 0:
+            new_deadline = min(timer[0] for timer in tuple(new_timers))
+            if deadline is None or new_deadline < deadline:
+                deadline = new_deadline
+        return deadline
+
+    @staticmethod
+    def _get_threads() -> List['Thread']:
+        """get all initialized Threads"""
+        with Thread._by_ident_lock:
+            return list(Thread._by_ident.values())
 
     def get_printable_info(self, include_tasks=False) -> str:
         s = '[Thread-S]' if self.is_created() else '[Thread-R]'
@@ -178,20 +550,78 @@ class Thread:
         if self._finalized_ev.is_set():
             s += '[FINALIZED]'
 
+        if self._cpu_affinity is not None:
+            s += f'[CPU {_format_cpu_list(self._cpu_affinity)}]'
+
+        if self._fair:
+            s += '[FAIR]'
+            for taskset, weight, count, cpu_time in self.get_sched_groups_info():
+                s += f'\n{taskset.get_name() if taskset is not None else "default"} weight: {weight} queued: {count} cpu time: {cpu_time:.3f}s'
+
         if include_tasks:
-            with self._lock:
-                if self._active_tasks is not None:
-                    active_tasks = tuple( task for task in self._active_tasks if not task.is_done() )
-                    if len(active_tasks) != 0:
-                        s += '\nThread active tasks:'
-                        for i, task in enumerate(active_tasks):
-                            s += f'\n[{i}]: {task}'
+            active_tasks = tuple( task for task in self.get_active_tasks() if not task.is_done() )
+            if len(active_tasks) != 0:
+                s += '\nThread active tasks:'
+                for i, task in enumerate(active_tasks):
+                    s += f'\n[{i}]: {task}'
         return s
 
     def __repr__(self): return self.__str__()
     def __str__(self): return self.get_printable_info()
 
 
+def _format_cpu_list(cpus : Iterable[int]) -> str:
+    # {0,1,2,3,8} -> '0-3,8'
+    ranges = []
+    for cpu in sorted(cpus):
+        if len(ranges) != 0 and ranges[-1][1] == cpu - 1:
+            ranges[-1][1] = cpu
+        else:
+            ranges.append([cpu, cpu])
+    return ','.join( f'{first}-{last}' if first != last else f'{first}' for first, last in ranges )
+
+def _parse_cpu_list(s : str) -> Set[int]:
+    # '0-3,8' -> {0,1,2,3,8}
+    cpus = set()
+    for part in s.strip().split(','):
+        if len(part) != 0:
+            first, _, last = part.partition('-')
+            cpus.update(range(int(first), int(last if len(last) != 0 else first) + 1))
+    return cpus
+
+def get_numa_nodes() -> List[Set[int]]:
+    """get available CPUs of every NUMA node, single node with all available CPUs if NUMA info is not available"""
+    available = os.sched_getaffinity(0) if hasattr(os, 'sched_getaffinity') else set(range(os.cpu_count() or 1))
+    nodes = []
+    for path in sorted(glob.glob('/sys/devices/system/node/node[0-9]*/cpulist'), key=lambda path: int(path.split('node')[-1].split('/')[0])):
+        with open(path) as file:
+            cpus = _parse_cpu_list(file.read()) & available
+        if len(cpus) != 0:
+            nodes.append(cpus)
+    return nodes if len(nodes) != 0 else [available]
+
+def create_pinned_threads(per : str = 'core', name : str = None, **kwargs) -> List[Thread]:
+    """
+    Create Threads pinned to CPUs available for the process.
+
+        per('core')     'core' : one Thread per CPU, pinned to the CPU
+                        'numa' : one Thread per NUMA node, pinned to CPUs of the node
+
+        name(None)      prefix of names of Threads
+
+    other kwargs are passed to Thread(...)
+    """
+    if per == 'core':
+        cpu_sets = [ {cpu} for cpu in sorted(os.sched_getaffinity(0)) ]
+    elif per == 'numa':
+        cpu_sets = get_numa_nodes()
+    else:
+        raise ValueError(f'Unknown per {per}')
+
+    if name is None:
+        name = f'pinned {per}'
+    return [ Thread(name=f'{name} {_format_cpu_list(cpus)}', cpu_affinity=cpus, **kwargs) for cpus in cpu_sets ]
+
 def create_thread(name : str = None) -> Thread:
     return Thread(name=name, create=True,  check=1)
 
@@ -201,3 +631,7 @@ def get_current_thread() -> Union[Thread, None]:
     if thread is None:
         thread = Thread(register=True)
     return thread
+
+def _find_current_thread() -> Union[Thread, None]:
+    """get current easytask.Thread, None if current OS thread is not registered"""
+    return Thread._by_ident.get(threading.get_ident(), None)
@@ -0,0 +1,353 @@
+import concurrent.futures
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from .decorators import taskmethod
+from .FileReader import FileReader
+from .futures import from_future
+from .InterpreterThread import InterpreterThread
+from .log import get_log_level, set_log_level
+from .service import clear
+from .SharedBuffer import SharedBuffer, SharedBufferPool
+from .Task import Task
+from .Taskset import Taskset
+from .Thread import Thread
+from .yields import (yield_propagate, yield_read, yield_sleep,
+                     yield_switch_thread, yield_wait)
+
+
+class easytask:
+    # it is like global import easytask, but keep local import for bench.py
+
+    Task = Task
+    Taskset = Taskset
+    Thread = Thread
+    taskmethod = taskmethod
+
+    yield_propagate = yield_propagate
+    yield_read = yield_read
+    yield_sleep = yield_sleep
+    yield_switch_thread = yield_switch_thread
+    yield_wait = yield_wait
+
+
+@easytask.taskmethod()
+def handoff_hop_task(consumer_thread) -> easytask.Task:
+    yield easytask.yield_switch_thread(consumer_thread)
+
+@easytask.taskmethod()
+def handoff_producer_task(producer_thread, consumer_thread, count) -> easytask.Task:
+    yield easytask.yield_switch_thread(producer_thread)
+    tasks = [ handoff_hop_task(consumer_thread) for _ in range(count) ]
+    yield easytask.yield_wait(tasks)
+
+def handoff_contention(producers_count, hops_per_producer=20000):
+    """
+    `producers_count` Threads switch Tasks into single consumer Thread at the same time.
+
+    returns hops per second
+    """
+    consumer_thread = easytask.Thread(name='consumer')
+    producer_threads = [ easytask.Thread(name=f'producer #{i}') for i in range(producers_count) ]
+
+    time_start = time.perf_counter()
+    tasks = [ handoff_producer_task(producer_thread, consumer_thread, hops_per_producer) for producer_thread in producer_threads ]
+    for task in tasks:
+        task.wait()
+    time_elapsed = time.perf_counter() - time_start
+
+    for thread in producer_threads + [consumer_thread]:
+        thread.finalize()
+
+    return (producers_count*hops_per_producer) / time_elapsed
+
+@easytask.taskmethod()
+def switch_thread_task(thread_a, thread_b, count) -> easytask.Task:
+    for _ in range(count):
+        yield easytask.yield_switch_thread(thread_a)
+        yield easytask.yield_switch_thread(thread_b)
+
+def switch_thread_scaling(pairs_count, switches_per_pair=20000, tasks_per_pair=64):
+    """
+    `pairs_count` independent pairs of Threads, Tasks of each pair switch between its two Threads.
+
+    returns switches per second
+    """
+    threads = [ easytask.Thread(name=f'switch #{i}') for i in range(pairs_count*2) ]
+
+    count = switches_per_pair // (tasks_per_pair*2)
+    time_start = time.perf_counter()
+    tasks = [ switch_thread_task(threads[i*2], threads[i*2+1], count)
+              for i in range(pairs_count) for _ in range(tasks_per_pair) ]
+    for task in tasks:
+        task.wait()
+    time_elapsed = time.perf_counter() - time_start
+
+    for thread in threads:
+        thread.finalize()
+
+    return (len(tasks)*count*2) / time_elapsed
+
+@easytask.taskmethod()
+def cancel_sleep_task(thread) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep(999.0)
+
+def taskset_cancel(threads_count, deferred, tasks_count=100000):
+    """
+    Cancel `tasks_count` Tasks of Taskset sleeping in `threads_count` Threads
+    with cancel_all() or cancel_all_deferred().
+
+    returns (seconds spent in the call by caller, seconds until all Tasks are done)
+    """
+    threads = [ easytask.Thread(name=f'cancel #{i}') for i in range(threads_count) ]
+    ts = easytask.Taskset()
+    with ts.as_scope():
+        tasks = [ cancel_sleep_task(threads[i % threads_count]) for i in range(tasks_count) ]
+    while sum(thread.get_active_tasks_count() for thread in threads) != tasks_count:
+        time.sleep(0.01)
+    # switched Tasks are queued before they sleep
+    time.sleep(0.1)
+
+    time_start = time.perf_counter()
+    if deferred:
+        done_task = ts.cancel_all_deferred()
+    else:
+        ts.cancel_all()
+    time_call = time.perf_counter() - time_start
+    if deferred:
+        done_task.wait()
+    time_done = time.perf_counter() - time_start
+
+    for thread in threads:
+        thread.finalize()
+
+    return time_call, time_done
+
+@easytask.taskmethod()
+def file_reader_task(path, chunk_size) -> easytask.Task:
+    reader = FileReader(path, chunk_size=chunk_size)
+    total = 0
+    while True:
+        chunk = yield easytask.yield_read(reader)
+        if len(chunk) == 0:
+            break
+        total += len(chunk)
+    return total
+
+@easytask.taskmethod()
+def file_blocking_task(path, chunk_size) -> easytask.Task:
+    total = 0
+    with open(path, 'rb', buffering=0) as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if len(chunk) == 0:
+                break
+            total += len(chunk)
+    return total
+
+def file_read(use_reader, size=256*1024*1024, chunk_size=1024*1024):
+    """
+    Sequential read of `size` bytes file by FileReader or blocking reads in the Thread.
+    File is likely in OS page cache.
+
+    returns bytes per second
+    """
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'file')
+        with open(path, 'wb') as file:
+            for _ in range(size // chunk_size):
+                file.write(bytes(chunk_size))
+
+        time_start = time.perf_counter()
+        task = (file_reader_task if use_reader else file_blocking_task)(path, chunk_size).wait()
+        time_elapsed = time.perf_counter() - time_start
+
+    return task.result() / time_elapsed
+
+@easytask.taskmethod()
+def affinity_latency_task(client_thread, data_thread, data, count) -> easytask.Task:
+    latencies = []
+    for _ in range(count):
+        time_start = time.perf_counter()
+        yield easytask.yield_switch_thread(data_thread)
+        sum(data)
+        latencies.append(time.perf_counter() - time_start)
+        yield easytask.yield_switch_thread(client_thread)
+    return latencies
+
+def affinity_latency(pinned, count=2000, data_size=64*1024):
+    """
+    Round trips of a Task to Thread which owns shared data, while other processes load all but one CPUs.
+
+    returns (p50, p99) latency in seconds
+    """
+    cpus = sorted(os.sched_getaffinity(0))
+    load_processes = []
+    try:
+        for _ in range(len(cpus)-1):
+            load_processes.append(subprocess.Popen([sys.executable, '-c', 'while True: pass']))
+
+        client_thread = easytask.Thread(name='client')
+        data_thread = easytask.Thread(name='data', cpu_affinity={cpus[-1]} if pinned else None)
+        data = list(range(data_size))
+        try:
+            latencies = sorted(affinity_latency_task(client_thread, data_thread, data, count).wait().result())
+        finally:
+            data_thread.finalize()
+            client_thread.finalize()
+    finally:
+        for process in load_processes:
+            process.kill()
+            process.wait()
+
+    return latencies[len(latencies)//2], latencies[len(latencies)*99//100]
+
+def cpu_work(n):
+    x = 0
+    for i in range(n):
+        x = (x + i*i) % 1000003
+    return x
+
+@easytask.taskmethod()
+def cpu_thread_task(thread, n) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    return cpu_work(n)
+
+@easytask.taskmethod()
+def cpu_pool_task(pool, n) -> easytask.Task:
+    yield easytask.yield_propagate(from_future(pool.submit(cpu_work, n)))
+
+def cpu_parallel(kind, workers_count, calls_count=64, n=100000):
+    """
+    CPU-bound calls of pure python function distributed over `workers_count` workers.
+
+        kind    'threads'       easytask.Thread's
+                'processes'     ProcessPoolExecutor
+                'interpreters'  InterpreterThread
+
+    returns calls per second
+    """
+    threads = []
+    pool = None
+    interp_thread = None
+    if kind == 'threads':
+        threads = [ easytask.Thread(name=f'cpu #{i}') for i in range(workers_count) ]
+    elif kind == 'processes':
+        pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers_count)
+        # exclude startup of processes
+        list(pool.map(cpu_work, [1]*workers_count))
+    elif kind == 'interpreters':
+        interp_thread = InterpreterThread(name='cpu', workers=workers_count)
+        for task in [ interp_thread.run(cpu_work, 1) for _ in range(workers_count) ]:
+            task.wait()
+
+    time_start = time.perf_counter()
+    if kind == 'threads':
+        tasks = [ cpu_thread_task(threads[i % workers_count], n) for i in range(calls_count) ]
+    elif kind == 'processes':
+        tasks = [ cpu_pool_task(pool, n) for _ in range(calls_count) ]
+    else:
+        tasks = [ interp_thread.run(cpu_work, n) for _ in range(calls_count) ]
+    for task in tasks:
+        task.wait()
+    time_elapsed = time.perf_counter() - time_start
+
+    for thread in threads:
+        thread.finalize()
+    if pool is not None:
+        pool.shutdown()
+    if interp_thread is not None:
+        interp_thread.finalize()
+
+    return calls_count / time_elapsed
+
+def transfer_bytes_work(data):
+    return len(data)
+
+def transfer_handle_work(handle):
+    buffer = SharedBuffer.attach(handle)
+    size = len(buffer.buf)
+    buffer.release()
+    return size
+
+@easytask.taskmethod()
+def transfer_task(pool, buffer_pool, size, use_handle) -> easytask.Task:
+    if use_handle:
+        buffer = buffer_pool.acquire(size)
+        future = pool.submit(transfer_handle_work, buffer.get_handle())
+    else:
+        future = pool.submit(transfer_bytes_work, bytes(size))
+    yield easytask.yield_propagate(from_future(future))
+
+def shared_buffer_transfer(use_handle, size=8*1024*1024, calls_count=32):
+    """
+    Pass `size` bytes to worker process as pickled bytes or as SharedBuffer handle.
+
+    returns calls per second
+    """
+    pool = concurrent.futures.ProcessPoolExecutor(max_workers=1)
+    list(pool.map(transfer_bytes_work, [b'']))
+    buffer_pool = SharedBufferPool()
+
+    time_start = time.perf_counter()
+    for _ in range(calls_count):
+        transfer_task(pool, buffer_pool, size, use_handle).wait()
+    time_elapsed = time.perf_counter() - time_start
+
+    pool.shutdown()
+    buffer_pool.finalize()
+    return calls_count / time_elapsed
+
+def run_bench():
+    """
+    Run easytask benchmarks and print results.
+    """
+    log_level = get_log_level()
+    set_log_level(0)
+
+    clear()
+
+    for producers_count in [1, 4, 16]:
+        hops_per_sec = handoff_contention(producers_count)
+        print(f'handoff_contention producers={producers_count:<3} {hops_per_sec:12.0f} hops/s')
+
+    is_gil_enabled = getattr(sys, '_is_gil_enabled', lambda: True)()
+    for pairs_count in [1, 2, 4, 8]:
+        switches_per_sec = switch_thread_scaling(pairs_count)
+        print(f'switch_thread_scaling threads={pairs_count*2:<3} gil={is_gil_enabled} {switches_per_sec:12.0f} switches/s')
+
+    for threads_count in [1, 4]:
+        for deferred in [False, True]:
+            time_call, time_done = taskset_cancel(threads_count, deferred)
+            print(f'taskset_cancel threads={threads_count:<3} deferred={deferred!s:<6} call {time_call*1000.0:8.1f}ms, all done {time_done*1000.0:8.1f}ms')
+
+    for use_reader in [False, True]:
+        bytes_per_sec = file_read(use_reader)
+        kind = 'FileReader' if use_reader else 'blocking'
+        print(f'file_read {kind:<12} {bytes_per_sec/(1024*1024):12.1f} MB/s')
+
+    if hasattr(os, 'sched_setaffinity'):
+        for pinned in [False, True]:
+            p50, p99 = affinity_latency(pinned)
+            print(f'affinity_latency pinned={pinned!s:<6} p50 {p50*1000000.0:8.1f}us p99 {p99*1000000.0:8.1f}us')
+
+    kinds = ['threads', 'processes']
+    if InterpreterThread.is_available():
+        kinds.append('interpreters')
+    for kind in kinds:
+        for workers_count in [1, 4]:
+            calls_per_sec = cpu_parallel(kind, workers_count)
+            print(f'cpu_parallel {kind:<12} workers={workers_count:<3} {calls_per_sec:12.1f} calls/s')
+
+    for use_handle in [False, True]:
+        calls_per_sec = shared_buffer_transfer(use_handle)
+        kind = 'handle' if use_handle else 'bytes'
+        print(f'shared_buffer_transfer {kind:<12} {calls_per_sec:12.1f} calls/s')
+
+    clear()
+
+    set_log_level(log_level)
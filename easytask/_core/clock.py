@@ -0,0 +1,112 @@
+import threading
+import time
+
+
+class Clock:
+    def __init__(self):
+        """
+        Real monotonic clock.
+
+        Used by yield_sleep and easytask.Thread's to measure time.
+        """
+
+    def is_virtual(self) -> bool: return False
+
+    def time(self) -> float:
+        """current time in seconds"""
+        return time.monotonic()
+
+    def _attach(self, thread): ...
+    def _detach(self, thread): ...
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[Clock][{self.time():.3f}]'
+
+
+class VirtualClock(Clock):
+    def __init__(self, start : float = 0.0, tick : float = 0.005):
+        """
+        Virtual time clock for deterministic and instant test and simulation runs.
+
+        easytask.Thread's using this clock don't sleep in real time.
+        Every tick of Thread advances the clock by `tick` seconds.
+        When all Threads have only sleeping or waiting Tasks, the clock jumps to the nearest yield_sleep deadline.
+
+        Threads using the same VirtualClock are ticked in lockstep, so order of Tasks doesn't depend on real time:
+        the clock advances only when every Thread executing tasks loop with the clock finished its tick,
+        so long Task or blocked OS thread holds the clock for all Threads.
+        Thread stops holding the clock when it leaves the loop (finalized, or wait() is returned).
+        """
+        super().__init__()
+        self._tick = tick
+        self._now = start
+
+        self._cond = threading.Condition()
+        self._threads = set()
+        self._arrived = {}      # Thread -> (busy, deadline) of Threads finished current tick, accessed inside _cond only
+        self._epoch = 0
+
+    def is_virtual(self) -> bool: return True
+    def time(self) -> float: return self._now
+
+    def _attach(self, thread):
+        with self._cond:
+            self._threads.add(thread)
+
+    def _detach(self, thread):
+        with self._cond:
+            self._threads.discard(thread)
+            self._arrived.pop(thread, None)
+            if len(self._arrived) != 0 and len(self._arrived) >= len(self._threads):
+                self._advance()
+
+    def _tick_thread(self, thread, busy : bool, deadline):
+        """Called by Thread at the end of tick. Returns when the clock advanced."""
+        with self._cond:
+            self._arrived[thread] = (busy, deadline)
+
+            if len(self._arrived) >= len(self._threads):
+                self._advance()
+            else:
+                # wait the last Thread of the tick, or detach of Threads which didn't arrive
+                epoch = self._epoch
+                while self._epoch == epoch:
+                    self._cond.wait()
+
+    def _advance(self):
+        now = self._now + self._tick
+
+        # inside _cond, all attached Threads arrived
+        arrived = self._arrived.values()
+        if not any(busy for busy, _ in arrived):
+            # All Threads are idle, jump to the nearest deadline
+            deadlines = [ deadline for _, deadline in arrived if deadline is not None ]
+            if len(deadlines) != 0:
+                now = max(now, min(deadlines))
+
+        self._now = now
+        self._arrived = {}
+        self._epoch += 1
+        self._cond.notify_all()
+
+    def __str__(self): return f'[VirtualClock][{self._now:.3f}]'
+
+
+_CLOCK = Clock()
+
+def set_clock(clock : Clock):
+    """
+    set global clock used by easytask.Thread's without own clock.
+
+    Should be set before Threads are created or execute_tasks_loop() is started.
+
+    ```
+        easytask.set_clock( easytask.VirtualClock() )
+    ```
+    """
+    global _CLOCK
+    _CLOCK = clock
+
+def get_clock() -> Clock:
+    global _CLOCK
+    return _CLOCK
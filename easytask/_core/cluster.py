@@ -0,0 +1,575 @@
+"""
+Distribution of taskmethods over worker processes, local or on other hosts, over TCP.
+
+Worker side:
+```
+    @easytask.cluster.remotemethod()
+    def resize_image(data) -> easytask.Task:
+        ...
+
+    easytask.cluster.run_worker('coordinator-host', 7000)
+```
+
+Coordinator side:
+```
+    coordinator = easytask.cluster.Coordinator(port=7000, authkey=key)
+    coordinator.spawn_workers(4, modules=['my_module'])     # or run workers on other hosts
+
+    result = yield easytask.cluster.yield_remote('resize_image', data)
+```
+
+Messages are pickled, so a peer which is able to send messages can execute any code in the receiving process.
+Coordinator and workers authenticate each other by HMAC challenge with shared `authkey` before any message is unpickled,
+but traffic is not encrypted. Listen on public networks only with secret authkey, or use a tunnel/VPN.
+"""
+import hashlib
+import hmac
+import os
+import pickle
+import socket
+import struct
+import subprocess
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, Dict, List, Sequence, Union
+
+from .lock_profiler import create_lock
+from .log import get_log_level
+from .Task import Task
+from .Thread import Thread
+from .yields import yield_remote
+
+_HEADER = struct.Struct('<I')
+_CHALLENGE_SIZE = 32
+_AUTHKEY_ENV = 'EASYTASK_CLUSTER_AUTHKEY'
+
+def _send_msg(sock : socket.socket, lock, msg : tuple):
+    # length-prefixed pickled message
+    data = pickle.dumps(msg, protocol=pickle.HIGHEST_PROTOCOL)
+    with lock:
+        sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_exact(sock : socket.socket, size : int) -> bytes:
+    buf = bytearray(size)
+    view = memoryview(buf)
+    pos = 0
+    while pos < size:
+        received = sock.recv_into(view[pos:])
+        if received == 0:
+            raise ConnectionError('Connection closed.')
+        pos += received
+    return bytes(buf)
+
+def _recv_msg(sock : socket.socket) -> tuple:
+    size, = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    return pickle.loads(_recv_exact(sock, size))
+
+def _send_bytes(sock : socket.socket, data : bytes):
+    sock.sendall(_HEADER.pack(len(data)) + data)
+
+def _recv_bytes(sock : socket.socket, max_size : int) -> bytes:
+    # not pickled message of handshake
+    size, = _HEADER.unpack(_recv_exact(sock, _HEADER.size))
+    if size > max_size:
+        raise ConnectionError('Handshake message is too large.')
+    return _recv_exact(sock, size)
+
+def _deliver_challenge(sock : socket.socket, authkey : bytes):
+    # peer proves that it knows authkey
+    challenge = os.urandom(_CHALLENGE_SIZE)
+    _send_bytes(sock, challenge)
+    digest = _recv_bytes(sock, hashlib.sha256().digest_size)
+    if not hmac.compare_digest(digest, hmac.new(authkey, challenge, hashlib.sha256).digest()):
+        _send_bytes(sock, b'fail')
+        raise ConnectionError('Authentication failed.')
+    _send_bytes(sock, b'ok')
+
+def _answer_challenge(sock : socket.socket, authkey : bytes):
+    challenge = _recv_bytes(sock, _CHALLENGE_SIZE)
+    _send_bytes(sock, hmac.new(authkey, challenge, hashlib.sha256).digest())
+    if _recv_bytes(sock, 4) != b'ok':
+        raise ConnectionError('Authentication failed.')
+
+def _authenticate(sock : socket.socket, authkey : bytes, is_server : bool, timeout : float):
+    # mutual authentication, before any pickled message
+    sock.settimeout(timeout)
+    if is_server:
+        _deliver_challenge(sock, authkey)
+        _answer_challenge(sock, authkey)
+    else:
+        _answer_challenge(sock, authkey)
+        _deliver_challenge(sock, authkey)
+    sock.settimeout(None)
+
+def _pickle_exception(e : Exception) -> Exception:
+    try:
+        pickle.dumps(e)
+        return e
+    except Exception:
+        return Exception(f'{type(e).__name__}: {e}')
+
+
+# Worker side
+
+_remote_methods : Dict[str, Callable] = {}
+
+def remotemethod(name : str = None):
+    """
+    decorator. Registers function (usually taskmethod) to be called by Coordinator in worker process.
+
+        name(None)      name for yield_remote, default is __qualname__ of the function
+
+    Apply it after @easytask.taskmethod().
+    """
+    def declaration_wrapper(func):
+        _remote_methods[name if name is not None else getattr(func, '_wrapped_method', func).__qualname__] = func
+        return func
+    return declaration_wrapper
+
+def run_worker(host : str, port : int, authkey : bytes = None, concurrency : int = None, name : str = None, heartbeat_timeout : float = 10.0):
+    """
+    Connect to Coordinator and execute calls of remote methods registered with @remotemethod,
+    until Coordinator stops the worker or is lost.
+
+    Calls are executed in easytask.Thread of current OS thread.
+
+        authkey(None)       bytes, the same as authkey of Coordinator.
+                            Default is hex of environment variable EASYTASK_CLUSTER_AUTHKEY.
+
+        concurrency(None)   amount of calls executed at the same time, used by Coordinator to balance load,
+                            default os.cpu_count()
+
+        heartbeat_timeout(10.0)     seconds without messages from Coordinator, after which worker exits
+    """
+    from .decorators import taskmethod
+    from .Thread import get_current_thread
+
+    if authkey is None:
+        authkey = os.environ.get(_AUTHKEY_ENV, None)
+        if authkey is None:
+            raise Exception(f'authkey is not specified and {_AUTHKEY_ENV} is not set.')
+        authkey = bytes.fromhex(authkey)
+
+    if concurrency is None:
+        concurrency = os.cpu_count() or 1
+    if name is None:
+        name = f'{socket.gethostname()}:{os.getpid()}'
+
+    sock = socket.create_connection((host, port))
+    sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+    try:
+        _authenticate(sock, authkey, is_server=False, timeout=heartbeat_timeout)
+    except Exception:
+        sock.close()
+        raise
+    send_lock = create_lock('cluster.worker._send_lock')
+    _send_msg(sock, send_lock, ('hello', name, sorted(_remote_methods.keys()), concurrency))
+
+    thread = get_current_thread()
+    state = _WorkerState(sock, send_lock, thread)
+    # messages are handled by Tasks started in the Thread
+    state._handle_task = taskmethod(thread=thread)(state._handle)
+
+    reader = threading.Thread(target=state._reader_func, name='easytask cluster worker reader', daemon=True)
+    reader.start()
+
+    thread.execute_tasks_loop(condition=lambda: state._is_stopped(heartbeat_timeout))
+
+    state._stopped = True
+    for task in tuple(state._tasks.values()):
+        task.cancel()
+    sock.close()
+
+
+class _WorkerState:
+    def __init__(self, sock : socket.socket, send_lock, thread : Thread):
+        self._sock = sock
+        self._send_lock = send_lock
+        self._thread = thread
+        self._tasks : Dict[int, Task] = {}      # call_id -> Task, accessed inside the Thread only
+        self._handle_task : Callable[[tuple], Task] = None
+        self._stopped = False
+        self._last_seen = time.monotonic()
+
+    def _is_stopped(self, heartbeat_timeout : float) -> bool:
+        if not self._stopped and time.monotonic() - self._last_seen > heartbeat_timeout:
+            if get_log_level() >= 1:
+                print('easytask cluster worker: coordinator is lost.')
+            self._stopped = True
+        return self._stopped
+
+    def _reader_func(self):
+        try:
+            while True:
+                msg = _recv_msg(self._sock)
+                self._last_seen = time.monotonic()
+
+                kind = msg[0]
+                if kind == 'heartbeat':
+                    self._send(('heartbeat',))
+                elif kind == 'stop':
+                    break
+                else:
+                    self._handle_task(msg)
+        except (OSError, ConnectionError, EOFError):
+            pass
+        self._stopped = True
+        self._thread._active_tasks_ev.set()
+
+    def _handle(self, msg : tuple):
+        # call or cancel from Coordinator, inside the Thread
+        kind = msg[0]
+        if kind == 'call':
+            _, call_id, name, args, kwargs = msg
+            self._call(call_id, name, args, kwargs)
+        elif kind == 'cancel':
+            task = self._tasks.pop(msg[1], None)
+            if task is not None:
+                task.cancel()
+
+    def _send(self, msg : tuple):
+        try:
+            _send_msg(self._sock, self._send_lock, msg)
+        except OSError:
+            self._stopped = True
+
+    def _call(self, call_id : int, name : str, args, kwargs):
+        func = _remote_methods.get(name, None)
+        try:
+            if func is None:
+                raise Exception(f'Remote method {name} is not registered in worker.')
+            result = func(*args, **kwargs)
+        except Exception as e:
+            self._send(('result', call_id, False, _pickle_exception(e)))
+            return
+
+        if isinstance(result, Task):
+            self._tasks[call_id] = result
+            result.call_on_done(lambda task, call_id=call_id: self._on_task_done(call_id, task))
+        else:
+            self._send_result(call_id, True, result)
+
+    def _on_task_done(self, call_id : int, task : Task):
+        self._tasks.pop(call_id, None)
+        if task.is_succeeded():
+            self._send_result(call_id, True, task.result())
+        else:
+            exception = task.exception()
+            self._send_result(call_id, False, _pickle_exception(exception) if exception is not None else None)
+
+    def _send_result(self, call_id : int, success : bool, value):
+        try:
+            pickle.dumps(value)
+        except Exception as e:
+            success, value = False, Exception(f'Unable to pickle result of remote method: {e}')
+        self._send(('result', call_id, success, value))
+
+
+def _worker_main():
+    # entry point of workers spawned by Coordinator.spawn_workers
+    host, port, concurrency = sys.argv[1], int(sys.argv[2]), int(sys.argv[3])
+    import importlib
+    for module in sys.argv[4:]:
+        importlib.import_module(module)
+    run_worker(host, port, concurrency=concurrency)
+
+
+# Coordinator side
+
+class _RemoteWorker:
+    def __init__(self, sock : socket.socket, address):
+        self._sock = sock
+        self._address = address
+        self._send_lock = create_lock('cluster._RemoteWorker._send_lock')
+        self._name = None
+        self._methods = set()
+        self._concurrency = 1
+        self._calls : Dict[int, Task] = {}      # call_id -> Task, inside Coordinator._lock
+        self._last_seen = time.monotonic()
+        self._alive = True
+
+    def get_load(self) -> float:
+        return len(self._calls) / self._concurrency
+
+
+class Coordinator:
+    _default : 'Coordinator' = None
+
+    def __init__(self, host : str = '127.0.0.1', port : int = 0, authkey : bytes = None,
+                       heartbeat_interval : float = 1.0, heartbeat_timeout : float = 5.0):
+        """
+        Accepts workers (easytask.cluster.run_worker) over TCP and dispatches calls of remote methods to them.
+
+        The last created Coordinator is default for yield_remote.
+
+            port(0)     0 - any free port, see get_address()
+
+            authkey(None)   bytes, shared secret of Coordinator and workers, see get_authkey().
+                            Default is random key, which is passed to spawned workers.
+                            Peers without the key are disconnected before any message is unpickled.
+
+            heartbeat_interval(1.0)     seconds between heartbeats to workers
+            heartbeat_timeout(5.0)      worker without messages for this time is considered lost,
+                                        its calls are cancelled with Exception.
+        """
+        self._authkey = authkey if authkey is not None else os.urandom(32)
+        self._heartbeat_interval = heartbeat_interval
+        self._heartbeat_timeout = heartbeat_timeout
+
+        self._lock = create_lock('cluster.Coordinator._lock')
+        self._workers : List[_RemoteWorker] = []
+        self._pending = []      # (call_id, Task, name, args, kwargs) waiting for worker with the method
+        self._call_counter = 0
+        self._processes : List[subprocess.Popen] = []
+        self._finalized = False
+
+        self._server = socket.create_server((host, port))
+        self._address = self._server.getsockname()[:2]
+
+        self._accept_t = threading.Thread(target=self._accept_func, name='easytask cluster accept', daemon=True)
+        self._accept_t.start()
+        self._heartbeat_ev = threading.Event()
+        self._heartbeat_t = threading.Thread(target=self._heartbeat_func, name='easytask cluster heartbeat', daemon=True)
+        self._heartbeat_t.start()
+
+        Coordinator._default = self
+
+    def get_address(self):
+        """get (host, port) for workers"""
+        return self._address
+
+    def get_authkey(self) -> bytes:
+        """get authkey for run_worker on other hosts"""
+        return self._authkey
+
+    def get_workers_info(self) -> List[Dict]:
+        """get list of dict(name, address, methods, concurrency, calls) of connected workers"""
+        with self._lock:
+            return [ {'name' : worker._name, 'address' : worker._address, 'methods' : sorted(worker._methods),
+                      'concurrency' : worker._concurrency, 'calls' : len(worker._calls) }
+                     for worker in self._workers ]
+
+    def spawn_workers(self, count : int, modules : Sequence[str] = (), concurrency : int = 1):
+        """
+        Spawn `count` local worker processes, which import `modules` to register remote methods.
+        Spawned processes are terminated on finalize().
+        """
+        host, port = self._address
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(path for path in sys.path if len(path) != 0)
+        # not in arguments, which are visible to other users
+        env[_AUTHKEY_ENV] = self._authkey.hex()
+
+        for _ in range(count):
+            process = subprocess.Popen([sys.executable, '-c', 'from easytask._core.cluster import _worker_main; _worker_main()',
+                                        host, str(port), str(concurrency), *modules], env=env)
+            with self._lock:
+                self._processes.append(process)
+
+    def wait_workers(self, count : int, timeout : float = None) -> bool:
+        """Block until `count` workers are connected. Returns False on timeout."""
+        time_start = time.monotonic()
+        while len(self._workers) < count:
+            if timeout is not None and time.monotonic() - time_start >= timeout:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def call(self, name : str, *args, **kwargs) -> Task:
+        """
+        Call remote method in least loaded worker which has it.
+
+        Returns Task with result of the method. Cancelling the Task cancels the call in worker.
+        If no worker has the method, call waits for such worker.
+        """
+        if callable(name):
+            name = getattr(name, '_wrapped_method', name).__qualname__
+
+        task = Task(name=f'remote {name}')
+        with self._lock:
+            if self._finalized:
+                task.cancel()
+                return task
+            self._call_counter += 1
+            call_id = self._call_counter
+            worker = self._dispatch(call_id, task, name, args, kwargs)
+
+        task.call_on_done(lambda task, call_id=call_id: self._on_call_done(call_id, task))
+        if worker is not None:
+            self._send_call(worker, call_id, name, args, kwargs)
+        return task
+
+    def finalize(self):
+        """Stop workers, cancel calls and terminate spawned worker processes."""
+        with self._lock:
+            if self._finalized:
+                return
+            self._finalized = True
+            workers, self._workers = self._workers, []
+            pending, self._pending = self._pending, []
+            processes, self._processes = self._processes, []
+
+        self._heartbeat_ev.set()
+        self._server.close()
+
+        for worker in workers:
+            try:
+                _send_msg(worker._sock, worker._send_lock, ('stop',))
+            except OSError:
+                pass
+            self._drop_worker(worker, Exception('Coordinator is finalized.'))
+        for _, task, _, _, _ in pending:
+            task.cancel()
+        for process in processes:
+            try:
+                process.wait(timeout=self._heartbeat_timeout)
+            except subprocess.TimeoutExpired:
+                process.kill()
+                process.wait()
+
+        if Coordinator._default is self:
+            Coordinator._default = None
+
+    def _dispatch(self, call_id : int, task : Task, name : str, args, kwargs) -> Union[_RemoteWorker, None]:
+        # inside self._lock
+        workers = [ worker for worker in self._workers if worker._alive and name in worker._methods ]
+        if len(workers) == 0:
+            self._pending.append( (call_id, task, name, args, kwargs) )
+            return None
+
+        worker = min(workers, key=_RemoteWorker.get_load)
+        worker._calls[call_id] = task
+        return worker
+
+    def _send_call(self, worker : _RemoteWorker, call_id : int, name : str, args, kwargs):
+        try:
+            _send_msg(worker._sock, worker._send_lock, ('call', call_id, name, args, kwargs))
+        except Exception as e:
+            if isinstance(e, OSError):
+                self._drop_worker(worker, Exception(f'Worker {worker._name} is lost: {e}'))
+            else:
+                # unable to pickle arguments
+                with self._lock:
+                    task = worker._calls.pop(call_id, None)
+                if task is not None:
+                    task.cancel(exception=e)
+
+    def _on_call_done(self, call_id : int, task : Task):
+        with self._lock:
+            for i, (pending_call_id, _, _, _, _) in enumerate(self._pending):
+                if pending_call_id == call_id:
+                    self._pending.pop(i)
+                    return
+            for worker in self._workers:
+                if worker._calls.pop(call_id, None) is not None:
+                    break
+            else:
+                return
+
+        # done by caller before result
+        try:
+            _send_msg(worker._sock, worker._send_lock, ('cancel', call_id))
+        except OSError:
+            pass
+
+    def _accept_func(self):
+        while True:
+            try:
+                sock, address = self._server.accept()
+            except OSError:
+                break
+            sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+            worker = _RemoteWorker(sock, address)
+            threading.Thread(target=self._reader_func, args=(worker,), name='easytask cluster reader', daemon=True).start()
+
+    def _reader_func(self, worker : _RemoteWorker):
+        try:
+            _authenticate(worker._sock, self._authkey, is_server=True, timeout=self._heartbeat_timeout)
+        except Exception as e:
+            if get_log_level() >= 1 and not self._finalized:
+                print(f'easytask cluster: connection from {worker._address} is rejected: {e}')
+            worker._sock.close()
+            return
+
+        try:
+            _, worker._name, methods, worker._concurrency = _recv_msg(worker._sock)
+            worker._methods = set(methods)
+            worker._last_seen = time.monotonic()
+
+            with self._lock:
+                if self._finalized:
+                    worker._sock.close()
+                    return
+                self._workers.append(worker)
+                # dispatch calls waiting for the methods
+                pending, self._pending = self._pending, []
+                calls = [ (call_id, name, args, kwargs, self._dispatch(call_id, task, name, args, kwargs))
+                          for call_id, task, name, args, kwargs in pending ]
+
+            for call_id, name, args, kwargs, call_worker in calls:
+                if call_worker is not None:
+                    self._send_call(call_worker, call_id, name, args, kwargs)
+
+            if get_log_level() >= 2:
+                print(f'easytask cluster: worker {worker._name} connected from {worker._address}')
+
+            while True:
+                msg = _recv_msg(worker._sock)
+                worker._last_seen = time.monotonic()
+                if msg[0] == 'result':
+                    _, call_id, success, value = msg
+                    with self._lock:
+                        task = worker._calls.pop(call_id, None)
+                    if task is not None:
+                        if success:
+                            task.success(value)
+                        else:
+                            task.cancel(exception=value)
+
+        except Exception as e:
+            if worker._alive and not self._finalized and get_log_level() >= 1 and not isinstance(e, (OSError, ConnectionError, EOFError)):
+                print(f'easytask cluster: error in connection with worker {worker._name}. Traceback:\n{traceback.format_exc()}')
+            self._drop_worker(worker, Exception(f'Worker {worker._name} is lost: {e}'))
+
+    def _heartbeat_func(self):
+        while not self._heartbeat_ev.wait(self._heartbeat_interval):
+            now = time.monotonic()
+            for worker in tuple(self._workers):
+                if now - worker._last_seen > self._heartbeat_timeout:
+                    self._drop_worker(worker, Exception(f'Worker {worker._name} is not responding.'))
+                    continue
+                try:
+                    _send_msg(worker._sock, worker._send_lock, ('heartbeat',))
+                except OSError as e:
+                    self._drop_worker(worker, Exception(f'Worker {worker._name} is lost: {e}'))
+
+    def _drop_worker(self, worker : _RemoteWorker, exception : Exception):
+        with self._lock:
+            if not worker._alive:
+                return
+            worker._alive = False
+            if worker in self._workers:
+                self._workers.remove(worker)
+            calls, worker._calls = worker._calls, {}
+
+        try:
+            worker._sock.close()
+        except OSError:
+            pass
+
+        if get_log_level() >= 1 and not self._finalized:
+            print(f'easytask cluster: {exception}')
+
+        for task in calls.values():
+            task.cancel(exception=exception)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[Coordinator][{self._address[0]}:{self._address[1]}][{len(self._workers)} workers]'
+
+
+def get_coordinator() -> Union[Coordinator, None]:
+    """get default Coordinator"""
+    return Coordinator._default
+
@@ -7,12 +7,13 @@ def print_debug_info():
     """
     s = ''
 
-    active_tasks = set(Task._active_tasks)
+    active_tasks = set(Task._active_tasks.get_tasks())
 
-    if len(Thread._by_ident) != 0:
+    threads = Thread._get_threads()
+    if len(threads) != 0:
         s += '\nUnfinalized threads: '
 
-        for i, thread in enumerate(Thread._by_ident.values()):
+        for i, thread in enumerate(threads):
 
             for task in thread.get_active_tasks():
                 if task in active_tasks:
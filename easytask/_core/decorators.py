@@ -1,30 +1,93 @@
+import inspect
+import threading
 from types import GeneratorType
+from typing import Sequence, Union
 
+from .StreamTask import StreamTask
 from .Task import Task
 from .TaskExecutor import TaskExecutor
+from .Thread import Thread, get_current_thread
 
-def taskmethod():
+def taskmethod(thread : Union[Thread, Sequence[Thread]] = None, lazy : bool = False):
     """decorator.
 
     Method always returns Task object. You should annotate method with return type -> easytask.Task[ return_type ]
 
     available yields inside taskmethod : easytask.yield_*
+
+        thread(None)    Thread or sequence of Threads where method starts execution.
+                        From sequence the Thread with least active Tasks is chosen,
+                        the sequence must not be empty when the method is called.
+                        If it is not current Thread, start of the method is deferred to the Thread,
+                        so code before first yield doesn't run in caller.
+
+        lazy(False)     always defer start of the method, even in current Thread.
+                        Caller only creates the Task.
+    """
+    def declaration_wrapper(method):
+        return _wrap_method(method, lambda: Task(name=f'{method.__qualname__}'), thread, lazy)
+         
+    return declaration_wrapper
+
+def streammethod(buffer_size : int = 64, thread : Union[Thread, Sequence[Thread]] = None, lazy : bool = False):
+    """decorator.
+
+    Same as taskmethod, but method returns StreamTask object. You should annotate method with return type -> easytask.StreamTask[ item_type ]
+
+    Items are emitted with `yield easytask.yield_emit(item)`.
+    Emitting is suspended while `buffer_size` items are not consumed.
     """
     def declaration_wrapper(method):
-        
+        return _wrap_method(method, lambda: StreamTask(name=f'{method.__qualname__}', buffer_size=buffer_size), thread, lazy)
+
+    return declaration_wrapper
+
+def _wrap_method(method, create_task, thread = None, lazy = False):
+    if thread is None and not lazy:
         def easytask_method(*args, **kwargs):
-            task = Task(name=f'{method.__qualname__}')
+            task = create_task()
+            _start_method(task, method, args, kwargs)
+            return task
+    else:
+        threads = (thread,) if thread is None or isinstance(thread, Thread) else thread
+        if isinstance(threads, tuple) and len(threads) == 0:
+            raise ValueError(f'{method.__qualname__} empty sequence of Threads.')
+        is_generator = inspect.isgeneratorfunction(method)
 
-            result = method(*args, **kwargs)
-            if isinstance(result, GeneratorType):
-                TaskExecutor(task, result)
+        def easytask_method(*args, **kwargs):
+            if len(threads) == 1:
+                target_thread = threads[0]
+            elif len(threads) == 0:
+                # mutable sequence is emptied after decoration
+                raise ValueError(f'{method.__qualname__} empty sequence of Threads.')
             else:
-                task.success(result)
+                target_thread = min(threads, key=Thread._get_load)
 
+            task = create_task()
+            if target_thread is None:
+                target_thread = get_current_thread()
+
+            if not lazy and target_thread.get_ident() == threading.get_ident():
+                _start_method(task, method, args, kwargs)
+            else:
+                # creating generator of generator function doesn't execute the code
+                gen = method(*args, **kwargs) if is_generator else _deferred_call(method, args, kwargs)
+                TaskExecutor(task, gen, thread=target_thread)
             return task
-        
-        easytask_method._wrapped_method = method
-        
-        return easytask_method
-         
-    return declaration_wrapper
+
+    easytask_method._wrapped_method = method
+
+    return easytask_method
+
+def _start_method(task, method, args, kwargs):
+    result = method(*args, **kwargs)
+    if isinstance(result, GeneratorType):
+        TaskExecutor(task, result)
+    else:
+        task.success(result)
+
+def _deferred_call(method, args, kwargs):
+    result = method(*args, **kwargs)
+    if isinstance(result, GeneratorType):
+        result = yield from result
+    return result
@@ -0,0 +1,110 @@
+import threading
+import time
+from concurrent.futures import CancelledError, Future
+from typing import Iterable, Union
+
+from .Task import Task, get_current_task
+from .Thread import _find_current_thread
+
+
+def from_future(future : Future, name : str = None) -> Task:
+    """
+    Wrap concurrent.futures.Future to Task.
+
+    Task is done with result or exception of the Future, callbacks are called in the OS thread which completed the Future.
+    Cancellation of the Task cancels the Future if it is not started yet.
+
+    ```
+        t = easytask.from_future(pool.submit(func))
+        yield easytask.yield_wait(t)
+        result = t.result()
+    ```
+    """
+    task = Task(name=name if name is not None else f'future {future}')
+    task.call_on_done(lambda task, future=future: future.cancel())
+    future.add_done_callback(lambda future, task=task: _on_future_done(future, task))
+    return task
+
+def _on_future_done(future : Future, task : Task):
+    try:
+        exception = future.exception()
+    except CancelledError:
+        task.cancel()
+        return
+
+    if exception is None:
+        task.success(future.result())
+    else:
+        task.cancel(exception=exception)
+
+
+def wait_all(tasks : Iterable[Task], timeout : float = None) -> bool:
+    """
+    Block until all Tasks are done, returns False on timeout.
+
+    OS thread which is not easytask.Thread is blocked without polling and is not registered,
+    so it is cheap to call from worker threads of other libraries.
+    In easytask.Thread, Tasks of the Thread are executed while waiting.
+
+    Tasks of taskmethod(thread=None) called from such OS thread are still executed inline,
+    which registers the OS thread, use taskmethod(thread=...) to keep it unregistered.
+    """
+    tasks = tuple(tasks)
+    lock = threading.Lock()
+    done_ev = threading.Event()
+    remain = [len(tasks)]
+
+    def on_done(task):
+        with lock:
+            remain[0] -= 1
+            if remain[0] == 0:
+                done_ev.set()
+
+    if len(tasks) == 0:
+        return True
+    for task in tasks:
+        task.call_on_done(on_done)
+    if _wait(done_ev, timeout):
+        return True
+
+    # Tasks may stay active long after timeout, don't keep the callback in them
+    for task in tasks:
+        task._remove_on_done(on_done)
+    return False
+
+def wait_any(tasks : Iterable[Task], timeout : float = None) -> Union[Task, None]:
+    """
+    Block until any of Tasks is done, returns the done Task or None on timeout.
+
+    Waits same way as wait_all.
+    """
+    tasks = tuple(tasks)
+    done_tasks = []
+    done_ev = threading.Event()
+
+    def on_done(task):
+        done_tasks.append(task)
+        done_ev.set()
+
+    for task in tasks:
+        task.call_on_done(on_done)
+        if done_ev.is_set():
+            break
+    is_done = _wait(done_ev, timeout)
+
+    # other Tasks may stay active long after, don't keep the callback in them
+    for task in tasks:
+        task._remove_on_done(on_done)
+    return done_tasks[0] if is_done else None
+
+def _wait(done_ev : threading.Event, timeout : Union[float, None]) -> bool:
+    thread = _find_current_thread()
+    if thread is None:
+        return done_ev.wait(timeout)
+
+    if get_current_task() is not None:
+        raise Exception('Unable to wait inside Task. Use yield easytask.yield_wait(tasks)')
+
+    deadline = time.perf_counter() + timeout if timeout is not None else None
+    thread.execute_tasks_loop(condition=lambda: done_ev.is_set() or (deadline is not None and time.perf_counter() >= deadline))
+    return done_ev.is_set()
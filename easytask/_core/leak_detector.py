@@ -0,0 +1,43 @@
+import time
+from typing import Dict, List
+
+from .Task import Task
+from .TaskRegistry import TaskRegistry
+
+
+def set_leak_detection(enabled : bool):
+    """
+    Enable/disable recording of creation time of Tasks.
+
+    Only Tasks created after enabling are reported by get_leaked_tasks()
+    """
+    TaskRegistry._track_created_time = enabled
+
+def is_leak_detection() -> bool:
+    return TaskRegistry._track_created_time
+
+def get_leaked_tasks(older_than : float = 60.0) -> Dict[str, List[Task]]:
+    """
+    get active Tasks alive more than `older_than` seconds, grouped by Task name (taskmethod name).
+
+    Groups are sorted by count of Tasks descending.
+    """
+    now = time.monotonic()
+
+    tasks_by_name = {}
+    for task, created_time in Task._active_tasks.get_tasks_with_created_time():
+        if now - created_time >= older_than:
+            tasks_by_name.setdefault(task.get_name(), []).append(task)
+
+    return dict(sorted(tasks_by_name.items(), key=lambda item: len(item[1]), reverse=True))
+
+def print_leak_report(older_than : float = 60.0):
+    """
+    Prints count of Tasks alive more than `older_than` seconds by Task name.
+    """
+    leaked_tasks = get_leaked_tasks(older_than)
+    if len(leaked_tasks) != 0:
+        s = f'\neasytask Tasks alive more than {older_than}s:'
+        for name, tasks in leaked_tasks.items():
+            s += f'\n{len(tasks):8} {name}'
+        print(s + '\n')
@@ -0,0 +1,148 @@
+import threading
+import time
+from typing import Dict
+
+_ENABLED = False
+_STATS : Dict[str, 'LockStats'] = {}
+_STATS_LOCK = threading.Lock()
+
+
+class LockStats:
+    def __init__(self, site : str):
+        """
+        Contention statistics of all locks created at the same site.
+        Times are in seconds.
+        """
+        self._lock = threading.Lock()
+
+        self.site = site
+        self.acquire_count = 0
+        self.contended_count = 0
+        self.wait_time = 0.0
+        self.max_wait_time = 0.0
+        self.hold_time = 0.0
+        self.max_hold_time = 0.0
+
+    def copy(self) -> 'LockStats':
+        stats = LockStats(self.site)
+        with self._lock:
+            stats.acquire_count = self.acquire_count
+            stats.contended_count = self.contended_count
+            stats.wait_time = self.wait_time
+            stats.max_wait_time = self.max_wait_time
+            stats.hold_time = self.hold_time
+            stats.max_hold_time = self.max_hold_time
+        return stats
+
+    def _on_acquire(self, contended : bool, wait_time : float):
+        with self._lock:
+            self.acquire_count += 1
+            if contended:
+                self.contended_count += 1
+                self.wait_time += wait_time
+                self.max_wait_time = max(self.max_wait_time, wait_time)
+
+    def _on_release(self, hold_time : float):
+        with self._lock:
+            self.hold_time += hold_time
+            self.max_hold_time = max(self.max_hold_time, hold_time)
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        return (f'[LockStats][{self.site}] acquired: {self.acquire_count} contended: {self.contended_count} '
+                f'wait: {self.wait_time*1000.0:.3f}ms (max {self.max_wait_time*1000.0:.3f}ms) '
+                f'hold: {self.hold_time*1000.0:.3f}ms (max {self.max_hold_time*1000.0:.3f}ms)')
+
+
+class _ProfiledLock:
+    def __init__(self, lock, stats : LockStats):
+        self._lock = lock
+        self._stats = stats
+        self._depth = 0             # accessed by owner only
+        self._acquired_time = 0.0
+
+    def acquire(self, blocking=True, timeout=-1):
+        contended = False
+        wait_time = 0.0
+        if not self._lock.acquire(False):
+            if not blocking:
+                return False
+            contended = True
+            time_start = time.perf_counter()
+            if not self._lock.acquire(True, timeout):
+                return False
+            wait_time = time.perf_counter() - time_start
+
+        self._depth += 1
+        if self._depth == 1:
+            self._acquired_time = time.perf_counter()
+            self._stats._on_acquire(contended, wait_time)
+        return True
+
+    def release(self):
+        self._depth -= 1
+        if self._depth == 0:
+            self._stats._on_release(time.perf_counter() - self._acquired_time)
+        self._lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *_):
+        self.release()
+
+
+def _get_stats(site : str) -> LockStats:
+    stats = _STATS.get(site, None)
+    if stats is None:
+        with _STATS_LOCK:
+            stats = _STATS.get(site, None)
+            if stats is None:
+                stats = _STATS[site] = LockStats(site)
+    return stats
+
+def create_lock(site : str):
+    """create threading.Lock, profiled if lock profiling is enabled"""
+    if _ENABLED:
+        return _ProfiledLock(threading.Lock(), _get_stats(site))
+    return threading.Lock()
+
+def create_rlock(site : str):
+    """create threading.RLock, profiled if lock profiling is enabled"""
+    if _ENABLED:
+        return _ProfiledLock(threading.RLock(), _get_stats(site))
+    return threading.RLock()
+
+def set_lock_profiling(enabled : bool):
+    """
+    Enable/disable lock profiling.
+
+    Only locks of Task, Taskset, Thread and yields created after enabling are profiled.
+    """
+    global _ENABLED
+    _ENABLED = enabled
+
+def is_lock_profiling() -> bool:
+    return _ENABLED
+
+def get_lock_profile() -> Dict[str, LockStats]:
+    """get copy of LockStats by lock site"""
+    with _STATS_LOCK:
+        stats_list = list(_STATS.values())
+    return { stats.site : stats.copy() for stats in stats_list }
+
+def reset_lock_profile():
+    with _STATS_LOCK:
+        _STATS.clear()
+
+def print_lock_profile():
+    """
+    Prints lock statistics sorted by total wait time
+    """
+    stats_list = sorted(get_lock_profile().values(), key=lambda stats: (stats.wait_time, stats.hold_time), reverse=True)
+
+    s = '\neasytask lock profile:'
+    for stats in stats_list:
+        s += f'\n{stats}'
+    print(s + '\n')
@@ -0,0 +1,98 @@
+import traceback
+from typing import Callable
+
+from .log import get_log_level
+from .Task import Task
+from .Thread import Thread, get_current_thread
+
+
+class _PeriodicExecutor:
+    def __init__(self, task : Task, thread : Thread, interval : float, func : Callable, args, kwargs, catch_up : bool):
+        self._task = task
+        self._thread = thread
+        self._interval = interval
+        self._func = func
+        self._args = args
+        self._kwargs = kwargs
+        self._catch_up = catch_up
+        self._run_task : Task = None
+
+        task._executor = self
+        task.call_on_done(self._on_task_done)
+        self._deadline = thread.get_clock().time() + interval
+        if not thread._add_timer(self._deadline, task):
+            task.cancel()
+
+    def get_thread(self) -> Thread:
+        """Thread where the runs are started"""
+        return self._thread
+
+    def is_started(self) -> bool:
+        """periodic Task has no generator to clean up in its Thread"""
+        return False
+
+    def exec(self):
+        # executed by Thread when deadline is reached
+        task = self._task
+        if task.is_done():
+            return
+
+        run_task = self._run_task
+        if self._catch_up or not isinstance(run_task, Task) or run_task.is_done():
+            self._run()
+
+        # schedule next run against absolute deadline
+        interval = self._interval
+        deadline = self._deadline + interval
+        if not self._catch_up:
+            now = self._thread.get_clock().time()
+            if deadline <= now:
+                # skip missed runs
+                deadline += ((now - deadline) // interval + 1) * interval
+        self._deadline = deadline
+
+        if not self._thread._add_timer(deadline, task):
+            task.cancel()
+
+    def _on_task_done(self, task : Task):
+        # stop active run together with periodic Task
+        run_task = self._run_task
+        if isinstance(run_task, Task):
+            run_task.cancel()
+
+    def _run(self):
+        task = self._task
+        tls = self._thread.get_tls()
+
+        # runs are created as child tasks of periodic Task
+        tls._task_exec_stack.append(task)
+        try:
+            self._run_task = run_task = self._func(*self._args, **self._kwargs)
+            if task.is_done() and isinstance(run_task, Task):
+                # periodic Task is cancelled concurrently
+                run_task.cancel()
+        except Exception as e:
+            if get_log_level() >= 1:
+                print(f'Unhandled exception {e} occured during execution of {task}. Traceback:\n{traceback.format_exc()}')
+        tls._task_exec_stack.pop()
+
+
+def every(interval : float, func : Callable, *args, thread : Thread = None, catch_up : bool = False, **kwargs) -> Task:
+    """
+    Call `func(*args, **kwargs)` every `interval` seconds in `thread` (default current Thread).
+
+    Runs are scheduled against absolute deadlines of Thread's clock, so they don't drift.
+    Sleeping periodic job costs nothing per tick of the Thread.
+
+        catch_up(False)     False : when taskmethod run is still active or deadlines are missed,
+                                    the runs are skipped until next deadline in the future.
+                            True  : run for every deadline, even if previous run is still active.
+
+    Returns Task which represents periodic job. Cancel it to stop the job.
+    """
+    if thread is None:
+        thread = get_current_thread()
+
+    task = Task(name=f'every {interval}s {getattr(func, "__qualname__", func)}')
+    _PeriodicExecutor(task, thread, interval, func, args, kwargs, catch_up)
+    return task
@@ -0,0 +1,233 @@
+import os
+import selectors
+import subprocess
+import threading
+import traceback
+from collections import deque
+from typing import Dict
+
+from .lock_profiler import create_lock
+from .log import get_log_level
+
+_READ_SIZE = 65536
+
+
+class _Process:
+    def __init__(self, executor, yield_value : 'yield_subprocess'):
+        # child process requested by yield_subprocess, accessed inside reactor thread only
+        self._executor = executor
+        self._yv = yield_value
+        self._popen : subprocess.Popen = None
+        self._pidfd = None
+        self._exited = False
+        self._fds = {}          # open pipe fd -> callback(data)
+        self._stdout = [] if yield_value._on_stdout is None else None
+        self._stderr = [] if yield_value._on_stderr is None else None
+        self._input = memoryview(yield_value._input) if yield_value._input is not None else None
+        self._cancelled = False
+
+
+class _Reactor:
+    def __init__(self):
+        """
+        OS thread which spawns child processes, streams their pipes and wakes Tasks on exit of the child.
+
+        Exit is detected by pidfd in the selector, without polling (Linux 5.3+),
+        otherwise processes are polled every 50ms.
+        """
+        self._max_processes = os.cpu_count() or 1
+        self._requests = deque()    # _Process to start, added from any thread
+        self._cancels = deque()     # _Process to kill, added from any thread
+
+        self._selector = selectors.DefaultSelector()
+        self._wakeup_r, self._wakeup_w = os.pipe()
+        os.set_blocking(self._wakeup_r, False)
+        os.set_blocking(self._wakeup_w, False)
+        self._selector.register(self._wakeup_r, selectors.EVENT_READ, None)
+
+        self._pending = deque()     # _Process waiting for free slot
+        self._running = set()       # _Process started
+
+        self._t = threading.Thread(target=self._thread_func, name='easytask subprocess reactor', daemon=True)
+        self._t.start()
+
+    def submit(self, process : _Process):
+        self._requests.append(process)
+        self._wakeup()
+
+    def cancel(self, process : _Process):
+        self._cancels.append(process)
+        self._wakeup()
+
+    def _wakeup(self):
+        try:
+            os.write(self._wakeup_w, b'\0')
+        except BlockingIOError:
+            # pipe is full, reactor is already woken up
+            pass
+
+    def _thread_func(self):
+        selector = self._selector
+        while True:
+            timeout = 0.05 if any(process._pidfd is None and not process._exited for process in self._running) else None
+            for key, mask in selector.select(timeout):
+                if key.data is None:
+                    try:
+                        while os.read(self._wakeup_r, _READ_SIZE):
+                            pass
+                    except BlockingIOError:
+                        pass
+                else:
+                    key.data(key.fd)
+
+            requests = self._requests
+            for _ in range(len(requests)):
+                self._pending.append(requests.popleft())
+
+            cancels = self._cancels
+            for _ in range(len(cancels)):
+                self._on_cancel(cancels.popleft())
+
+            while len(self._pending) != 0 and len(self._running) < self._max_processes:
+                self._start(self._pending.popleft())
+
+            for process in tuple(self._running):
+                if process._pidfd is None and not process._exited and process._popen.poll() is not None:
+                    process._exited = True
+                    self._try_finish(process)
+
+    def _start(self, process : _Process):
+        if process._cancelled:
+            return
+
+        yv = process._yv
+        try:
+            popen = process._popen = subprocess.Popen(yv._args,
+                                                      stdin=subprocess.PIPE if process._input is not None else subprocess.DEVNULL,
+                                                      stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                                      cwd=yv._cwd, env=yv._env)
+        except Exception as e:
+            process._executor._wake(throw_param=e)
+            return
+
+        self._running.add(process)
+        selector = self._selector
+
+        for pipe, chunks, on_data in ((popen.stdout, process._stdout, yv._on_stdout),
+                                      (popen.stderr, process._stderr, yv._on_stderr)):
+            fd = pipe.fileno()
+            os.set_blocking(fd, False)
+            process._fds[fd] = chunks.append if chunks is not None else on_data
+            selector.register(fd, selectors.EVENT_READ, lambda fd, process=process: self._on_read(process, fd))
+
+        if process._input is not None:
+            fd = popen.stdin.fileno()
+            os.set_blocking(fd, False)
+            selector.register(fd, selectors.EVENT_WRITE, lambda fd, process=process: self._on_write(process, fd))
+
+        pidfd_open = getattr(os, 'pidfd_open', None)
+        if pidfd_open is not None:
+            try:
+                process._pidfd = pidfd = pidfd_open(popen.pid)
+                selector.register(pidfd, selectors.EVENT_READ, lambda fd, process=process: self._on_exit(process))
+            except OSError:
+                process._pidfd = None
+
+    def _on_read(self, process : _Process, fd : int):
+        try:
+            data = os.read(fd, _READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError:
+            data = b''
+
+        if len(data) != 0:
+            try:
+                process._fds[fd](data)
+            except Exception as e:
+                if get_log_level() >= 1:
+                    print(f'Unhandled exception {e} occured in output callback of {process._yv}. Traceback:\n{traceback.format_exc()}')
+        else:
+            # EOF
+            self._selector.unregister(fd)
+            process._fds.pop(fd)
+            self._try_finish(process)
+
+    def _on_write(self, process : _Process, fd : int):
+        try:
+            written = os.write(fd, process._input)
+        except BlockingIOError:
+            return
+        except OSError:
+            # child closed stdin
+            written = len(process._input)
+
+        process._input = process._input[written:]
+        if len(process._input) == 0:
+            self._selector.unregister(fd)
+            process._popen.stdin.close()
+
+    def _on_exit(self, process : _Process):
+        self._selector.unregister(process._pidfd)
+        os.close(process._pidfd)
+        process._pidfd = None
+        process._exited = True
+        self._try_finish(process)
+
+    def _on_cancel(self, process : _Process):
+        process._cancelled = True
+        if process in self._running and not process._exited:
+            try:
+                process._popen.kill()
+            except OSError:
+                pass
+
+    def _try_finish(self, process : _Process):
+        if not process._exited or len(process._fds) != 0:
+            return
+
+        popen = process._popen
+        if popen.stdin is not None and not popen.stdin.closed:
+            self._selector.unregister(popen.stdin.fileno())
+            popen.stdin.close()
+        popen.stdout.close()
+        popen.stderr.close()
+        returncode = popen.wait()
+        self._running.discard(process)
+
+        result = subprocess.CompletedProcess(process._yv._args, returncode,
+                                             b''.join(process._stdout) if process._stdout is not None else None,
+                                             b''.join(process._stderr) if process._stderr is not None else None)
+        process._executor._wake(send_param=result)
+
+
+_REACTOR : _Reactor = None
+_REACTOR_LOCK = create_lock('process._REACTOR_LOCK')
+
+def _get_reactor() -> _Reactor:
+    global _REACTOR
+    reactor = _REACTOR
+    if reactor is None:
+        with _REACTOR_LOCK:
+            reactor = _REACTOR
+            if reactor is None:
+                reactor = _REACTOR = _Reactor()
+    return reactor
+
+def set_max_subprocesses(count : int):
+    """
+    Set maximum amount of concurrently running child processes of yield_subprocess (default os.cpu_count()).
+    Other yield_subprocess wait for free slot.
+    """
+    reactor = _get_reactor()
+    reactor._max_processes = count
+    reactor._wakeup()
+
+def get_max_subprocesses() -> int:
+    return _get_reactor()._max_processes
+
+def get_subprocesses_info() -> Dict[str, int]:
+    """get counts of running and pending child processes"""
+    reactor = _get_reactor()
+    return {'running' : len(reactor._running),
+            'pending' : len(reactor._pending) + len(reactor._requests) }
@@ -0,0 +1,377 @@
+"""
+Record and replay of scheduling workload.
+
+```
+    easytask.start_recording()
+    ... # real workload
+    trace = easytask.stop_recording()
+    trace.save('workload.etrace')
+
+    # later, with other build of easytask
+    report = easytask.WorkloadTrace.load('workload.etrace').replay()
+```
+
+Trace contains spawns of Tasks, kinds of yields which suspended the Tasks,
+busy time of the Tasks between yields, and Threads where they were executed.
+Replay regenerates the workload with synthetic Tasks, which spin the same busy time,
+yield in the same way, hop the same Threads and spawn children in the same place,
+and reports throughput and latency percentiles of the Tasks.
+"""
+import itertools
+import struct
+import time
+from typing import Dict, List, Sequence, Tuple
+
+from .lock_profiler import create_lock
+from .Task import Task
+from .Thread import Thread, get_current_thread
+from .yields import (yield_sleep, yield_sleep_tick, yield_sleep_until,
+                     yield_switch_thread, yield_wait)
+
+_MAGIC = b'ETRACE2\n'
+_RECORD = struct.Struct('<BBIIQIQ')     # kind, flag, thread, task, a, b, time
+_COUNT = struct.Struct('<I')
+_STRING_SIZE = struct.Struct('<H')
+
+_SPAWN = 0      # flag 0, a : parent task + 1 or 0, b : name, time : spawn time
+_SEGMENT = 1    # flag : yield kind, a : busy ns, time : first resume of the Task in the segment
+_DONE = 2       # flag : 1 if succeeded, time : done time
+
+_KIND_DONE = 'done'     # kind of the last segment of a Task
+
+
+class _Recorder:
+    def __init__(self):
+        self._time_start = time.perf_counter_ns()
+        self._lock = create_lock('recorder._Recorder._lock')
+        self._task_ids = itertools.count()
+        self._records = []      # packed records, list.append is atomic
+        self._names = {}        # str -> id
+        self._threads = {}      # (id(Thread), name) -> id, Threads are not referenced and are freed after finalize
+        self._kinds = { _KIND_DONE : 0 }
+
+    def _get_id(self, table : Dict, key) -> int:
+        id = table.get(key, None)
+        if id is None:
+            with self._lock:
+                id = table.get(key, None)
+                if id is None:
+                    id = table[key] = len(table)
+        return id
+
+    def _get_thread_id(self, thread : Thread) -> int:
+        # ident of OS thread is not known until the Thread is started, id() is
+        return self._get_id(self._threads, (id(thread), thread.get_name() or ''))
+
+    def _on_spawn(self, executor, parent : Task):
+        task = executor._task
+        executor._rec_id = task_id = next(self._task_ids)
+        parent_id = getattr(parent._executor, '_rec_id', None) if parent is not None else None
+
+        self._records.append(_RECORD.pack(_SPAWN, 0, self._get_thread_id(executor._current_thread), task_id,
+                                          parent_id + 1 if parent_id is not None else 0,
+                                          self._get_id(self._names, task.get_name() or ''),
+                                          time.perf_counter_ns() - self._time_start))
+        task.call_on_done(lambda task, task_id=task_id: self._on_done(task, task_id))
+
+    def _on_done(self, task : Task, task_id : int):
+        self._records.append(_RECORD.pack(_DONE, 1 if task.is_succeeded() else 0, 0, task_id, 0, 0,
+                                          time.perf_counter_ns() - self._time_start))
+
+    def _on_send(self, executor, time_send : int):
+        # after generator of the Task is resumed
+        busy = time.perf_counter_ns() - time_send
+        if executor._rec_busy is None:
+            executor._rec_busy = busy
+            executor._rec_time = time_send - self._time_start
+        else:
+            executor._rec_busy += busy
+
+    def _on_leave(self, executor, thread : Thread):
+        # Task leaves TaskExecutor.exec, segment is done if the Task was resumed
+        busy = executor._rec_busy
+        if busy is None or executor._rec_id is None:
+            return
+        executor._rec_busy = None
+
+        kind = _KIND_DONE if executor._task.is_done() else executor._yield_value.__class__.__name__
+        self._records.append(_RECORD.pack(_SEGMENT, self._get_id(self._kinds, kind), self._get_thread_id(thread),
+                                          executor._rec_id, busy, 0, executor._rec_time))
+
+    def _get_trace(self) -> 'WorkloadTrace':
+        with self._lock:
+            return WorkloadTrace([ name for name in self._names ],
+                                 [ name for _, name in self._threads ],
+                                 [ kind for kind in self._kinds ],
+                                 b''.join(self._records))
+
+_RECORDER : _Recorder = None
+_RECORDER_LOCK = create_lock('recorder._RECORDER_LOCK')
+
+def start_recording():
+    """
+    Start recording of workload of Tasks created after the call.
+    Recording costs time, measured throughput is lower while it is enabled.
+    """
+    global _RECORDER
+    with _RECORDER_LOCK:
+        _RECORDER = _Recorder()
+
+def stop_recording() -> 'WorkloadTrace':
+    """Stop recording, returns recorded WorkloadTrace"""
+    global _RECORDER
+    with _RECORDER_LOCK:
+        recorder, _RECORDER = _RECORDER, None
+    if recorder is None:
+        raise Exception('Recording is not started.')
+    return recorder._get_trace()
+
+def is_recording() -> bool:
+    return _RECORDER is not None
+
+
+class _TraceTask:
+    def __init__(self, name : str, parent : int, thread : int, spawn_time : int):
+        self._name = name
+        self._parent = parent
+        self._thread = thread
+        self._spawn_time = spawn_time
+        self._done_time = None
+        self._segments : List[Tuple[int, str, int, int]] = []   # (thread, kind, busy, time)
+        self._children : List[Tuple[int, '_TraceTask']] = []   # (index of spawning segment, child)
+
+
+class WorkloadTrace:
+    def __init__(self, names : List[str], threads : List[str], kinds : List[str], records : bytes):
+        """Recorded workload, created by easytask.stop_recording() or WorkloadTrace.load()"""
+        self._names = names
+        self._threads = threads
+        self._kinds = kinds
+        self._records = records
+
+    @staticmethod
+    def load(path : str) -> 'WorkloadTrace':
+        with open(path, 'rb') as f:
+            data = f.read()
+        if not data.startswith(_MAGIC):
+            raise Exception(f'{path} is not easytask workload trace.')
+
+        pos = len(_MAGIC)
+        tables = []
+        for _ in range(3):
+            count, = _COUNT.unpack_from(data, pos)
+            pos += _COUNT.size
+            table = []
+            for _ in range(count):
+                size, = _STRING_SIZE.unpack_from(data, pos)
+                pos += _STRING_SIZE.size
+                table.append(data[pos:pos+size].decode('utf-8'))
+                pos += size
+            tables.append(table)
+
+        return WorkloadTrace(*tables, data[pos:])
+
+    def save(self, path : str):
+        with open(path, 'wb') as f:
+            f.write(_MAGIC)
+            for table in (self._names, self._threads, self._kinds):
+                f.write(_COUNT.pack(len(table)))
+                for s in table:
+                    b = s.encode('utf-8')[:0xFFFF]
+                    f.write(_STRING_SIZE.pack(len(b)))
+                    f.write(b)
+            f.write(self._records)
+
+    def _get_tasks(self) -> Dict[int, _TraceTask]:
+        tasks = {}
+        for kind, flag, thread, task_id, a, b, t in _RECORD.iter_unpack(self._records):
+            if kind == _SPAWN:
+                tasks[task_id] = _TraceTask(self._names[b], a - 1 if a != 0 else None, thread, t)
+                continue
+
+            task = tasks.get(task_id, None)
+            if task is not None:
+                if kind == _SEGMENT:
+                    task._segments.append( (thread, self._kinds[flag], a, t) )
+                elif kind == _DONE:
+                    task._done_time = t
+
+        for task in tasks.values():
+            task._segments.sort(key=lambda segment: segment[3])
+            parent = tasks.get(task._parent, None) if task._parent is not None else None
+            if parent is not None:
+                # child is spawned inside the last segment of the parent started before the spawn
+                index = 0
+                for i, segment in enumerate(parent._segments):
+                    if segment[3] <= task._spawn_time:
+                        index = i
+                parent._children.append( (index, task) )
+            else:
+                task._parent = None
+        return tasks
+
+    def get_info(self) -> Dict:
+        """
+        get statistics of recorded workload:
+        counts of Tasks, segments between yields, Threads, yields by kind, duration, and latency percentiles of Tasks.
+        """
+        tasks = self._get_tasks()
+        yields = {}
+        segments_count = 0
+        for task in tasks.values():
+            segments_count += len(task._segments)
+            for segment in task._segments:
+                yields[segment[1]] = yields.get(segment[1], 0) + 1
+
+        times = [ task._spawn_time for task in tasks.values() ] + [ task._done_time for task in tasks.values() if task._done_time is not None ]
+        duration = (max(times) - min(times)) / 1e9 if len(times) != 0 else 0.0
+
+        info = {'tasks' : len(tasks),
+                'segments' : segments_count,
+                'threads' : len(self._threads),
+                'yields' : dict(sorted(yields.items(), key=lambda item: item[1], reverse=True)),
+                'duration' : duration }
+        info.update(_get_latency_info([ (task._done_time - task._spawn_time) / 1e9 for task in tasks.values() if task._done_time is not None ]))
+        return info
+
+    def replay(self, threads : Sequence[Thread] = None, time_scale : float = 1.0) -> Dict:
+        """
+        Replay the workload in current build of easytask. Blocks until all replayed Tasks are done.
+
+            threads(None)       Threads for recorded Threads by index modulo len(threads).
+                                Default is new Thread per recorded Thread.
+
+            time_scale(1.0)     multiplier of busy time, waits and spawn times of root Tasks
+
+        returns dict with counts of Tasks and segments, duration, throughput and latency percentiles of the Tasks.
+        """
+        from .TaskExecutor import TaskExecutor
+
+        tasks = self._get_tasks()
+        if len(tasks) == 0:
+            raise Exception(f'{self} has no Tasks.')
+
+        own_threads = threads is None
+        if own_threads:
+            threads = [ Thread(name=f'replay {name}') for name in self._threads ]
+
+        roots = sorted([ task for task in tasks.values() if task._parent is None ], key=lambda task: task._spawn_time)
+        replay = _Replay(threads, time_scale, len(tasks), TaskExecutor)
+
+        def replay_driver():
+            # spawns root Tasks at their recorded time
+            clock = get_current_thread().get_clock()
+            time_start = clock.time()
+            spawn_start = roots[0]._spawn_time
+            for root in roots:
+                deadline = time_start + (root._spawn_time - spawn_start) / 1e9 * time_scale
+                if deadline > clock.time():
+                    yield yield_sleep_until(deadline)
+                replay._spawn(root, root._thread)
+
+        time_start = time.perf_counter()
+        driver = Task(name='replay driver')
+        TaskExecutor(driver, replay_driver(), thread=replay._get_thread(roots[0]._thread))
+        replay._all_done.wait()
+        duration = time.perf_counter() - time_start
+        driver.cancel()
+
+        if own_threads:
+            for thread in threads:
+                thread.finalize()
+
+        segments_count = sum(len(task._segments) for task in tasks.values())
+        report = {'tasks' : len(tasks),
+                  'segments' : segments_count,
+                  'duration' : duration,
+                  'tasks_per_sec' : len(tasks) / duration if duration > 0 else 0.0,
+                  'segments_per_sec' : segments_count / duration if duration > 0 else 0.0 }
+        report.update(_get_latency_info(replay._latencies))
+        return report
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[WorkloadTrace][{len(self._records) // _RECORD.size} records]'
+
+
+class _Replay:
+    def __init__(self, threads : Sequence[Thread], time_scale : float, tasks_count : int, executor_cls):
+        # state of running WorkloadTrace.replay
+        self._threads = threads
+        self._time_scale = time_scale
+        self._executor_cls = executor_cls
+        self._lock = create_lock('recorder._Replay._lock')
+        self._remain = tasks_count
+        self._latencies = []
+        self._all_done = Task(name='replay all done')
+
+    def _get_thread(self, thread : int) -> Thread:
+        return self._threads[thread % len(self._threads)]
+
+    def _spawn(self, trace_task : _TraceTask, spawn_thread : int) -> Task:
+        task = Task(name=f'replay {trace_task._name}')
+        time_spawn = time.perf_counter()
+        task.call_on_done(lambda task, time_spawn=time_spawn: self._on_done(time_spawn))
+
+        thread = self._get_thread(trace_task._segments[0][0] if len(trace_task._segments) != 0 else spawn_thread)
+        self._executor_cls(task, self._run(trace_task), thread=thread)
+        return task
+
+    def _on_done(self, time_spawn : float):
+        latency = time.perf_counter() - time_spawn
+        with self._lock:
+            self._latencies.append(latency)
+            self._remain -= 1
+            all_done = self._remain == 0
+        if all_done:
+            self._all_done.success()
+
+    def _run(self, trace_task : _TraceTask):
+        # generator of replayed Task
+        segments = trace_task._segments
+        children = sorted(trace_task._children, key=lambda child: child[0])
+        child_index = 0
+        spawned = []
+        time_scale = self._time_scale
+
+        for i, (thread, kind, busy, t) in enumerate(segments):
+            thread = self._get_thread(thread)
+            if thread is not get_current_thread():
+                yield yield_switch_thread(thread)
+
+            time_end = time.perf_counter_ns() + int(busy * time_scale)
+            while time.perf_counter_ns() < time_end:
+                pass
+
+            while child_index < len(children) and children[child_index][0] == i:
+                spawned.append(self._spawn(children[child_index][1], segments[i][0]))
+                child_index += 1
+
+            if kind == _KIND_DONE or i == len(segments) - 1:
+                break
+            elif kind == 'yield_switch_thread':
+                # next segment is started in its Thread
+                continue
+            elif kind == 'yield_sleep_tick':
+                yield yield_sleep_tick()
+            elif kind in ('yield_wait', 'yield_propagate') and len(spawned) != 0:
+                yield yield_wait(spawned)
+                spawned = []
+            else:
+                wait = (segments[i+1][3] - (t + busy)) / 1e9 * time_scale
+                yield yield_sleep(wait) if wait > 0 else yield_sleep_tick()
+
+        # children spawned after the last segment
+        while child_index < len(children):
+            self._spawn(children[child_index][1], trace_task._thread)
+            child_index += 1
+
+
+def _get_latency_info(latencies : List[float]) -> Dict[str, float]:
+    latencies = sorted(latencies)
+    count = len(latencies)
+    def percentile(p):
+        return latencies[min(count - 1, int(count * p))] if count != 0 else 0.0
+    return {'latency_p50' : percentile(0.5),
+            'latency_p90' : percentile(0.9),
+            'latency_p99' : percentile(0.99),
+            'latency_max' : latencies[-1] if count != 0 else 0.0 }
@@ -6,12 +6,12 @@ def clear():
     Finalize all Threads, cancel all tasks, and clear resources.
     """
     while True:
-        threads = list(Thread._by_ident.values())
+        threads = Thread._get_threads()
         if len(threads) == 0:
             break
         thread = threads[0]
         thread.finalize()
 
     while len(Task._active_tasks) != 0:
-        for task in tuple(Task._active_tasks):
+        for task in Task._active_tasks.get_tasks():
             task.cancel()
@@ -1,37 +1,104 @@
+import concurrent.futures
+import gc
+import os
+import pickle
 import random
+import socket
+import struct
+import sys
+import tempfile
 import threading
+import time
+
+from . import cluster
+from . import recorder as recorder_module
+from .AdaptiveLimiter import AdaptiveLimiter
+from .Batcher import Batcher
+from .clock import VirtualClock, get_clock, set_clock
 
 from .debug import print_debug_info
-from .decorators import taskmethod
+from .decorators import streammethod, taskmethod
 from .exceptions import ETaskDone
+from .FileReader import FileReader
+from .futures import from_future, wait_all, wait_any
+from .Graph import Graph
+from .InterpreterThread import InterpreterThread
+from .leak_detector import get_leaked_tasks, set_leak_detection
+from .lock_profiler import (get_lock_profile, reset_lock_profile,
+                            set_lock_profiling)
 from .log import get_log_level, set_log_level
+from .periodic import every
+from .process import get_subprocesses_info
+from .recorder import WorkloadTrace, start_recording, stop_recording
 from .service import clear
+from .SharedBuffer import SharedBuffer, SharedBufferPool
+from .StreamTask import StreamTask
 from .Task import Task, get_current_task
 from .Taskset import Taskset
-from .Thread import Thread, get_current_thread
-from .yields import (yield_add_to, yield_cancel, yield_propagate, yield_sleep,
-                     yield_sleep_tick, yield_success, yield_switch_thread,
-                     yield_wait)
+from .TaskRegistry import TaskRegistry
+from .Thread import (Thread, create_pinned_threads, get_current_thread,
+                     get_numa_nodes)
+from .watchdog import start_watchdog, stop_watchdog
+from .yields import (yield_add_to, yield_admit, yield_batch, yield_call,
+                     yield_cancel, yield_emit, yield_next, yield_propagate,
+                     yield_read, yield_read_file, yield_sleep,
+                     yield_sleep_tick, yield_sleep_until, yield_subprocess,
+                     yield_success, yield_switch_thread, yield_wait)
 
 
 class easytask:
     # it is like global import easytask, but keep local import for test.py
 
+    cluster = cluster
     Task = Task
+    AdaptiveLimiter = AdaptiveLimiter
+    Batcher = Batcher
+    StreamTask = StreamTask
     Thread = Thread
     Taskset = Taskset
+    SharedBuffer = SharedBuffer
+    WorkloadTrace = WorkloadTrace
+    SharedBufferPool = SharedBufferPool
     ETaskDone = ETaskDone
-
+    FileReader = FileReader
+    Graph = Graph
+    InterpreterThread = InterpreterThread
+    VirtualClock = VirtualClock
+
+    create_pinned_threads = create_pinned_threads
+    every = every
+    from_future = from_future
     get_current_thread = get_current_thread
     get_current_task = get_current_task
+    get_clock = get_clock
+    get_subprocesses_info = get_subprocesses_info
+    get_leaked_tasks = get_leaked_tasks
+    get_numa_nodes = get_numa_nodes
+    get_lock_profile = get_lock_profile
+    reset_lock_profile = reset_lock_profile
+    set_leak_detection = set_leak_detection
+    set_lock_profiling = set_lock_profiling
+    start_watchdog = start_watchdog
+    stop_watchdog = stop_watchdog
+    set_clock = set_clock
     print_debug_info = print_debug_info
+    streammethod = streammethod
     taskmethod = taskmethod
 
+    yield_admit = yield_admit
+    yield_batch = yield_batch
+    yield_call = yield_call
     yield_cancel = yield_cancel
+    yield_emit = yield_emit
+    yield_next = yield_next
     yield_propagate = yield_propagate
     yield_add_to = yield_add_to
+    yield_read = yield_read
+    yield_read_file = yield_read_file
     yield_sleep = yield_sleep
     yield_sleep_tick = yield_sleep_tick
+    yield_sleep_until = yield_sleep_until
+    yield_subprocess = yield_subprocess
     yield_success = yield_success
     yield_switch_thread = yield_switch_thread
     yield_wait = yield_wait
@@ -259,6 +326,863 @@ def done_exception():
         return False
     return True
 
+@easytask.taskmethod()
+def call_task_1(i) -> easytask.Task:
+    if i == 0:
+        raise ValueError()
+    yield easytask.yield_sleep_tick()
+    return i
+
+@easytask.taskmethod()
+def call_task_0(i) -> easytask.Task:
+    result = yield easytask.yield_call(call_task_1, i)
+    result += yield from easytask.yield_call(call_task_1, i)
+    return result
+
+@easytask.taskmethod()
+def call_task() -> easytask.Task:
+    result = yield easytask.yield_call(call_task_0, 2)
+    try:
+        yield easytask.yield_call(call_task_0, 0)
+        return False
+    except ValueError:
+        ...
+    return result == 4
+
+def call():
+    return call_task().wait().result()
+
+@easytask.taskmethod()
+def virtual_clock_task_0(sec, order) -> easytask.Task:
+    yield easytask.yield_sleep(sec)
+    order.append(sec)
+
+@easytask.taskmethod()
+def virtual_clock_task() -> easytask.Task:
+    order = []
+    yield easytask.yield_wait([ virtual_clock_task_0(sec, order) for sec in [3600.0, 60.0, 1.0, 86400.0] ])
+    return order == [1.0, 60.0, 3600.0, 86400.0]
+
+@easytask.taskmethod()
+def virtual_clock_task_1(thread, sec, busy, order) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep(sec)
+    clock_start = thread.get_clock().time()
+    time_start = time.perf_counter()
+    while time.perf_counter() - time_start < busy:
+        ...
+    order.append( (thread.get_name(), thread.get_clock().time() - clock_start) )
+
+def virtual_clock():
+    prev_clock = easytask.get_clock()
+    clock = easytask.VirtualClock()
+    easytask.set_clock(clock)
+
+    time_start = time.perf_counter()
+    result = virtual_clock_task().wait().result()
+    time_elapsed = time.perf_counter() - time_start
+
+    easytask.set_clock(prev_clock)
+    result = result and clock.time() >= 86400.0 and time_elapsed < 1.0
+
+    # clock doesn't jump to far deadline of idle Thread while other Thread is busy in real time
+    clock = easytask.VirtualClock()
+    threads = [ easytask.Thread(name=name, clock=clock) for name in ('a', 'b') ]
+    order = []
+    tasks = [ virtual_clock_task_1(threads[0], 3600.0, 0.0, order),
+              virtual_clock_task_1(threads[1], 0.0, 0.05, order) ]
+    wait_all(tasks)
+    for thread in threads:
+        thread.finalize()
+
+    # busy Thread sees no time passed during its tick
+    return result and [ name for name, _ in order ] == ['b', 'a'] and order[0][1] == 0.0
+
+@easytask.streammethod(buffer_size=4)
+def stream_task_0(count) -> easytask.StreamTask[int]:
+    # produce in other Thread
+    thread = easytask.Thread(name='temp')
+    yield easytask.yield_switch_thread(thread)
+    for i in range(count):
+        yield easytask.yield_emit(i)
+    thread.finalize()
+
+@easytask.taskmethod()
+def stream_task() -> easytask.Task:
+    st = stream_task_0(64)
+    result = 0
+    while True:
+        item = yield easytask.yield_next(st)
+        if item is None:
+            break
+        if st.get_buffered_count() > st.get_buffer_size():
+            return False
+        result += item
+    return result == sum(range(64))
+
+def stream():
+    if not stream_task().wait().result():
+        return False
+    return list(stream_task_0(64).iter()) == list(range(64))
+
+@easytask.taskmethod()
+def graph_task_0(*args) -> easytask.Task:
+    yield easytask.yield_sleep_tick()
+    if any(arg is None for arg in args):
+        yield easytask.yield_cancel(ValueError())
+    return sum(args)
+
+@easytask.taskmethod()
+def graph_task_1(started) -> easytask.Task:
+    started.append(easytask.get_current_task())
+    yield easytask.yield_sleep(999.0)
+
+def graph():
+    thread = easytask.Thread(name='temp')
+
+    g = easytask.Graph('graph_1')
+    a = g.add_node('a', graph_task_0, 1)
+    b = g.add_node('b', graph_task_0, 2, deps=[a], thread=thread)
+    c = g.add_node('c', lambda x: x*10, deps=[a])
+    g.add_node('d', graph_task_0, deps=[b, c])
+    t = g.run().wait()
+
+    if not t.is_succeeded() or t.result() != {'a' : 1, 'b' : 3, 'c' : 10, 'd' : 13}:
+        return False
+    if len(g.get_critical_path()) != 3:
+        return False
+
+    g = easytask.Graph('graph_2')
+    a = g.add_node('a', graph_task_0, None)
+    b = g.add_node('b', graph_task_0, deps=[a], thread=thread)
+    c = g.add_node('c', graph_task_0, 1)
+    t = g.run().wait()
+
+    thread.finalize()
+
+    if not (not t.is_succeeded() and isinstance(t.exception(), ValueError) and \
+            b.is_skipped() and c.get_task().is_succeeded()):
+        return False
+
+    # long chain of nodes which finish immediately
+    g = easytask.Graph('graph_3')
+    node = g.add_node('0', lambda: 0)
+    for i in range(1, 5000):
+        node = g.add_node(f'{i}', lambda x: x+1, deps=[node])
+    t = g.run().wait()
+    if not (t.is_succeeded() and t.result()['4999'] == 4999):
+        return False
+
+    # cancelled graph stops running nodes
+    g = easytask.Graph('graph_4')
+    started = []
+    g.add_node('a', graph_task_1, started)
+    t = g.run()
+    t.cancel()
+    return len(started) == 1 and started[0].is_done()
+
+@easytask.taskmethod()
+def every_task_0(times) -> easytask.Task:
+    times.append(easytask.get_current_thread().get_clock().time())
+    yield easytask.yield_sleep_tick()
+
+@easytask.taskmethod()
+def every_task() -> easytask.Task:
+    clock = easytask.get_current_thread().get_clock()
+    times = []
+    start_time = clock.time()
+    t = easytask.every(60.0, every_task_0, times)
+    for i in range(1, 6):
+        yield easytask.yield_sleep_until(start_time + 60.0*i + 30.0)
+    t.cancel()
+    return times
+
+def periodic():
+    prev_clock = easytask.get_clock()
+    easytask.set_clock(easytask.VirtualClock())
+    times = every_task().wait().result()
+    easytask.set_clock(prev_clock)
+
+    # runs at 60, 120, ... without drift
+    return len(times) == 5 and all( abs(t - 60.0*(i+1)) < 0.1 for i, t in enumerate(times) )
+
+@easytask.taskmethod()
+def leak_detection_task() -> easytask.Task:
+    yield easytask.yield_sleep(999.0)
+
+@easytask.taskmethod()
+def timers_task(thread) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep(999.0)
+
+def every_sleep_task():
+    return timers_task(easytask.get_current_thread())
+
+def timers():
+    # cancelled sleeping Tasks are not counted and are dropped from timer heap
+    thread = easytask.Thread(name='temp')
+    tasks = [ timers_task(thread) for _ in range(200) ]
+    while len(thread._timers) != len(tasks):
+        time.sleep(0.01)
+    for task in tasks:
+        task.cancel()
+    result = thread.get_active_tasks_count() == 0 and len(thread.get_active_tasks()) == 0
+    time.sleep(0.05)
+    result = result and len(thread._timers) < 64
+
+    # cancelling of periodic Task cancels its active run
+    t = easytask.every(0.01, every_sleep_task, thread=thread)
+    run_task = None
+    while run_task is None:
+        time.sleep(0.01)
+        run_task = t._executor._run_task
+    t.cancel()
+    result = result and run_task.is_done()
+
+    thread.finalize()
+    return result
+
+def leak_detection():
+    easytask.set_leak_detection(True)
+    t = leak_detection_task()
+    easytask.set_leak_detection(False)
+
+    leaked_tasks = easytask.get_leaked_tasks(older_than=0.0)
+    if leaked_tasks.get(t.get_name(), None) != [t]:
+        return False
+    t.cancel()
+    return len(easytask.get_leaked_tasks(older_than=0.0)) == 0
+
+class _RegistryItem: ...
+
+def task_registry():
+    # item collected while the registry lock is held doesn't deadlock
+    registry = TaskRegistry(shards_count=1)
+    items = [ _RegistryItem() for _ in range(10) ]
+    for item in items:
+        registry.add(item)
+    with registry._shards[0]._lock:
+        del item
+        items.clear()
+    result = len(registry) == 0
+    item = _RegistryItem()
+    registry.add(item)
+    return result and len(registry._shards[0]._refs) == 1 and registry.get_tasks() == [item]
+
+@easytask.taskmethod()
+def fair_thread_task_0(ts, thread) -> easytask.Task:
+    yield easytask.yield_add_to(ts)
+    yield easytask.yield_switch_thread(thread)
+    while True:
+        time_start = time.perf_counter()
+        while time.perf_counter() - time_start < 0.0002:
+            ...
+        yield easytask.yield_sleep_tick()
+
+@easytask.taskmethod()
+def fair_thread_task_1(ts, thread) -> easytask.Task:
+    if ts is not None:
+        yield easytask.yield_add_to(ts)
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep_tick()
+
+def fair_thread():
+    thread = easytask.Thread(name='temp', fair=True)
+    ts_heavy = easytask.Taskset('heavy', weight=1.0)
+    ts_light = easytask.Taskset('light', weight=3.0)
+
+    for _ in range(200):
+        fair_thread_task_0(ts_heavy, thread)
+    for _ in range(100):
+        fair_thread_task_0(ts_light, thread)
+
+    time.sleep(1.0)
+    cpu_time = { ts : ts_cpu_time for ts, _, _, ts_cpu_time in thread.get_sched_groups_info() }
+
+    ts_heavy.finalize()
+    ts_light.finalize()
+    thread.finalize()
+
+    # light Taskset with 2x less Tasks got 3x more CPU time
+    ratio = cpu_time[ts_light] / cpu_time[ts_heavy]
+    result = ratio > 2.0 and ratio < 4.5
+
+    # weight must be positive
+    for weight in (0.0, -1.0):
+        try:
+            easytask.Taskset('invalid', weight=weight)
+            result = False
+        except ValueError:
+            ...
+        try:
+            ts_light.set_weight(weight)
+            result = False
+        except ValueError:
+            ...
+
+    # group of dropped Taskset is forgotten
+    thread = easytask.Thread(name='temp', fair=True)
+    ts = easytask.Taskset('dropped', weight=1.0)
+    fair_thread_task_1(ts, thread).wait()
+    groups_count = len(thread._sched_groups)
+    del ts
+    gc.collect()
+    fair_thread_task_1(None, thread).wait()
+    result = result and groups_count == 1 and list(thread._sched_groups) == [None]
+    thread.finalize()
+    return result
+
+@easytask.taskmethod()
+def watchdog_task() -> easytask.Task:
+    # stalls in first step, executed inside creating Task
+    time.sleep(0.3)
+    yield easytask.yield_sleep_tick()
+
+@easytask.taskmethod()
+def watchdog_fair_task(thread, ev, stall) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_wait(ev)
+    time.sleep(stall)
+
+@easytask.taskmethod()
+def watchdog_timer_task(thread, delay, stall) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep(delay)
+    time.sleep(stall)
+
+def watchdog():
+    thread = easytask.Thread(name='temp')
+    reports = []
+    easytask.start_watchdog(stall_time=0.1, on_report=reports.append)
+
+    @easytask.taskmethod()
+    def switch_task() -> easytask.Task:
+        yield easytask.yield_switch_thread(thread)
+        yield easytask.yield_wait(watchdog_task())
+
+    switch_task().wait()
+    easytask.stop_watchdog()
+    thread.finalize()
+
+    result = len(reports) == 1 and reports[0].reason == 'stall' and reports[0].thread is thread and \
+             any('watchdog_task' in line for line in reports[0].task_stack)
+
+    # Task waiting in scheduling group of fair Thread behind stalled Task
+    thread = easytask.Thread(name='temp', fair=True)
+    reports = []
+    easytask.start_watchdog(stall_time=10.0, queue_time=0.1, on_report=reports.append)
+    ev = easytask.Task(name='watchdog ev')
+    tasks = [ watchdog_fair_task(thread, ev, stall) for stall in (0.3, 0.0) ]
+    time.sleep(0.05)
+    ev.success()
+    wait_all(tasks)
+    easytask.stop_watchdog()
+    thread.finalize()
+    result = result and len(reports) == 1 and reports[0].reason == 'queue' and reports[0].thread is thread
+
+    # sleeping Task past its deadline behind stalled Task
+    thread = easytask.Thread(name='temp')
+    reports = []
+    easytask.start_watchdog(stall_time=10.0, queue_time=0.1, on_report=reports.append)
+    wait_all([ watchdog_timer_task(thread, 0.01, 0.3), watchdog_timer_task(thread, 0.05, 0.0) ])
+    easytask.stop_watchdog()
+    thread.finalize()
+
+    return result and len(reports) == 1 and reports[0].reason == 'queue' and reports[0].thread is thread
+
+def interpreter_thread_func(x):
+    return x*2
+
+@easytask.taskmethod()
+def interpreter_thread_task(pool) -> easytask.Task:
+    t = easytask.from_future(pool.submit(interpreter_thread_func, 1))
+    yield easytask.yield_wait(t)
+    result = t.result()
+    if not easytask.InterpreterThread.is_available():
+        return result
+
+    interp_thread = easytask.InterpreterThread()
+    t = interp_thread.run(interpreter_thread_func, result)
+    yield easytask.yield_wait(t)
+    interp_thread.finalize()
+    return t.result()
+
+def interpreter_thread():
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as pool:
+        t = interpreter_thread_task(pool).wait()
+
+    if not easytask.InterpreterThread.is_available():
+        try:
+            easytask.InterpreterThread()
+            return False
+        except Exception:
+            return t.result() == 2
+
+    return t.result() == 4
+
+@easytask.taskmethod()
+def shared_buffer_task_1(thread, handle) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    buffer = easytask.SharedBuffer.attach(handle)
+    return bytes(buffer.buf)
+
+@easytask.taskmethod()
+def shared_buffer_task_0(pool, thread) -> easytask.Task:
+    buffer = pool.acquire(5)
+    buffer.buf[:] = b'hello'
+    t = shared_buffer_task_1(thread, buffer.get_handle())
+    yield easytask.yield_wait(t)
+    return t.result()
+
+def shared_buffer():
+    pool = easytask.SharedBufferPool()
+    thread = easytask.Thread(name='temp')
+
+    t = shared_buffer_task_0(pool, thread).wait()
+    if t.result() != b'hello':
+        return False
+
+    # buffer is released by both Tasks and reused
+    info = pool.get_info()
+    buffer = pool.acquire(100)
+    result = info['used'] == 0 and info['free'] == 1 and pool.get_info()['free'] == 0 and bytes(buffer.buf[:5]) == b'hello'
+    buffer.release()
+
+    thread.finalize()
+    pool.finalize()
+    return result
+
+@easytask.taskmethod()
+def batcher_task_0(batcher, i) -> easytask.Task:
+    try:
+        result = yield easytask.yield_batch(batcher, i)
+    except ValueError:
+        result = -1
+    return result
+
+@easytask.taskmethod()
+def batcher_task() -> easytask.Task:
+    batches = []
+    def func(items):
+        batches.append(len(items))
+        return [ ValueError() if item == 3 else item*2 for item in items ]
+
+    batcher = easytask.Batcher(func, max_size=4, max_delay=0.01)
+    tasks = [ batcher_task_0(batcher, i) for i in range(10) ]
+    yield easytask.yield_wait(tasks)
+    return [ t.result() for t in tasks ], batches
+
+@easytask.taskmethod()
+def batcher_task_1() -> easytask.Task:
+    yield easytask.yield_sleep(999.0)
+
+@easytask.taskmethod()
+def batcher_task_2(batcher, ts, i) -> easytask.Task:
+    yield easytask.yield_add_to(ts)
+    result = yield easytask.yield_batch(batcher, i)
+    return result
+
+def batcher():
+    results, batches = batcher_task().wait().result()
+    result = results == [0, 2, 4, -1, 8, 10, 12, 14, 16, 18] and batches == [4, 4, 2]
+
+    # func doesn't run inside the Task which added the last item
+    func_tasks = []
+    def func(items):
+        func_tasks.append(batcher_task_1())
+        return items
+    ts = easytask.Taskset('batcher')
+    batcher = easytask.Batcher(func, max_size=3, max_delay=999.0)
+    tasks = [ batcher_task_2(batcher, ts, i) for i in range(3) ]
+    wait_all(tasks, timeout=5.0)
+    result = result and len(func_tasks) == 1 and ts.count() == 0
+
+    # batch is processed when the timer Thread is finalized
+    thread = easytask.Thread(name='temp')
+    batcher = easytask.Batcher(func, max_delay=999.0, thread=thread)
+    tasks = [ batcher_task_2(batcher, ts, i) for i in range(3) ]
+    thread.finalize()
+    wait_all(tasks, timeout=5.0)
+    result = result and [ t.result() if t.is_succeeded() else None for t in tasks ] == [0, 1, 2]
+
+    for task in func_tasks:
+        task.cancel()
+    ts.finalize()
+    return result
+
+@easytask.taskmethod()
+def adaptive_limiter_task_0(limiter, running, max_running, delay) -> easytask.Task:
+    yield easytask.yield_admit(limiter)
+    running.append(1)
+    max_running[0] = max(max_running[0], len(running))
+    yield easytask.yield_sleep(delay)
+    running.pop()
+
+@easytask.taskmethod()
+def adaptive_limiter_task() -> easytask.Task:
+    # limit is not exceeded, excess Tasks are queued
+    limiter = easytask.AdaptiveLimiter(initial_limit=2, max_limit=2)
+    running, max_running = [], [0]
+    tasks = [ adaptive_limiter_task_0(limiter, running, max_running, 0.01) for _ in range(6) ]
+    queue_depth = limiter.get_queue_depth()
+    tasks[-1].cancel()
+    queue_depth_cancelled = limiter.get_queue_depth()
+    yield easytask.yield_wait(tasks)
+    result = queue_depth == 4 and queue_depth_cancelled == 3 and max_running[0] == 2 and limiter.get_in_flight() == 0
+
+    # limit decreases when latency is above the target
+    limiter = easytask.AdaptiveLimiter(initial_limit=8, target_latency=0.005)
+    running, max_running = [], [0]
+    yield easytask.yield_wait([ adaptive_limiter_task_0(limiter, running, max_running, 0.02) for _ in range(32) ])
+    result = result and limiter.get_limit() < 8
+
+    # full queue raises exception
+    log_level = get_log_level()
+    set_log_level(0)
+    limiter = easytask.AdaptiveLimiter(initial_limit=1, max_limit=1, max_queue=0)
+    tasks = [ adaptive_limiter_task_0(limiter, [], [0], 0.01) for _ in range(2) ]
+    yield easytask.yield_wait(tasks)
+    set_log_level(log_level)
+    result = result and tasks[0].is_succeeded() and tasks[1].exception() is not None
+    return result
+
+def adaptive_limiter():
+    return adaptive_limiter_task().wait().result()
+
+@easytask.taskmethod()
+def recorder_task_0(thread, i) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    yield easytask.yield_sleep(0.001)
+    return i
+
+@easytask.taskmethod()
+def recorder_task_1(thread_a, thread_b) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread_a)
+    yield easytask.yield_wait([ recorder_task_0(thread_b, i) for i in range(4) ])
+    yield easytask.yield_sleep_tick()
+
+def recorder():
+    thread_a = easytask.Thread(name='a')
+    thread_b = easytask.Thread(name='b')
+
+    start_recording()
+    for task in [ recorder_task_1(thread_a, thread_b) for _ in range(8) ]:
+        task.wait()
+
+    # recorder doesn't reference Threads
+    threads_table = recorder_module._RECORDER._threads
+    is_freed = len(threads_table) >= 2 and \
+               not any( isinstance(obj, easytask.Thread) for key in threads_table for obj in (key, *gc.get_referents(key)) )
+    trace = stop_recording()
+
+    thread_a.finalize()
+    thread_b.finalize()
+
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'workload.etrace')
+        trace.save(path)
+        trace = easytask.WorkloadTrace.load(path)
+
+    info = trace.get_info()
+    report = trace.replay()
+    return is_freed and info['tasks'] == 40 and info['yields'].get('yield_wait', 0) == 8 and info['yields'].get('yield_sleep', 0) == 32 and \
+           report['tasks'] == 40 and report['segments'] == info['segments'] and report['latency_p99'] > 0
+
+foreign_wait_threads = []
+
+@easytask.taskmethod(thread=foreign_wait_threads)
+def foreign_wait_task(delay, result) -> easytask.Task:
+    yield easytask.yield_sleep(delay)
+    if result is None:
+        yield easytask.yield_cancel()
+    return result
+
+def foreign_wait_thread_func(results):
+    fast, slow = foreign_wait_task(0.01, 1), foreign_wait_task(10.0, 2)
+    cancelled = foreign_wait_task(0.0, None)
+
+    fast_future, slow_future, cancelled_future = fast.as_future(), slow.as_future(), cancelled.as_future()
+    on_done_count = len(slow._on_done_funcs)
+    results.append( wait_any([slow, fast]) is fast )
+    results.append( not wait_all([fast, slow], timeout=0.01) )
+    # callbacks of wait_any and timed out wait_all are removed
+    results.append( len(slow._on_done_funcs) == on_done_count )
+    results.append( fast_future.result() == 1 and cancelled.wait() is cancelled and cancelled_future.cancelled() )
+
+    slow_future.cancel()
+    results.append( wait_all([slow], timeout=1.0) and slow.is_done() and not slow.is_succeeded() )
+    results.append( threading.get_ident() not in easytask.Thread._by_ident )
+
+def foreign_wait():
+    foreign_wait_threads.append(easytask.Thread(name='temp'))
+
+    results = []
+    t = threading.Thread(target=foreign_wait_thread_func, args=(results,))
+    t.start()
+    t.join()
+
+    foreign_wait_threads.pop().finalize()
+    return len(results) == 6 and all(results)
+
+lazy_threads = []
+
+@easytask.taskmethod(thread=lazy_threads, lazy=True)
+def lazy_task_0(started) -> easytask.Task:
+    started.append(threading.get_ident())
+    yield easytask.yield_sleep_tick()
+
+@easytask.taskmethod(lazy=True)
+def lazy_task_1(started):
+    started.append(threading.get_ident())
+    return 1
+
+def lazy():
+    lazy_threads.extend( easytask.Thread(name=f'temp #{i}') for i in range(2) )
+
+    started_0, started_1 = [], []
+    tasks = [ lazy_task_0(started_0) for _ in range(4) ]
+    t = lazy_task_1(started_1)
+    not_started = len(started_1) == 0
+
+    for task in tasks + [t]:
+        task.wait()
+
+    result = not_started and t.result() == 1 and \
+             set(started_0) <= set(thread.get_ident() for thread in lazy_threads) and \
+             started_1 == [threading.get_ident()]
+
+    for thread in lazy_threads:
+        thread.finalize()
+    lazy_threads.clear()
+
+    # empty sequence of Threads is rejected
+    for func in (lambda: lazy_task_0([]), lambda: easytask.taskmethod(thread=())(lazy_task_1)):
+        try:
+            func()
+            result = False
+        except ValueError:
+            ...
+    return result
+
+@easytask.taskmethod()
+def taskset_cancel_task(thread, started, idents) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    started.append(1)
+    try:
+        yield easytask.yield_sleep(999.0)
+    except easytask.ETaskDone:
+        idents.append(threading.get_ident())
+
+def taskset_cancel():
+    thread = easytask.Thread(name='temp')
+    ts = easytask.Taskset()
+
+    started, idents = [], []
+    with ts.as_scope():
+        tasks = [ taskset_cancel_task(thread, started, idents) for _ in range(100) ]
+    # wait all Tasks are sleeping in the thread
+    while len(started) != len(tasks):
+        time.sleep(0.01)
+
+    with ts.as_scope():
+        periodic_task = easytask.every(999.0, lambda: None, thread=thread)
+    ts.cancel_all_deferred().wait()
+
+    result = all(task.is_done() and not task.is_succeeded() for task in tasks) and \
+             idents == [thread.get_ident()]*len(tasks) and periodic_task.is_done()
+
+    # cancel_all() is synchronous
+    started = []
+    with ts.as_scope():
+        tasks = [ taskset_cancel_task(thread, started, []) for _ in range(5) ]
+    while len(started) != len(tasks):
+        time.sleep(0.01)
+    ts.cancel_all()
+    result = result and all(task.is_done() for task in tasks)
+
+    ts.finalize()
+    thread.finalize()
+    return result
+
+@easytask.taskmethod()
+def subprocess_task() -> easytask.Task:
+    result_0 = yield easytask.yield_subprocess([sys.executable, '-c', 'import sys; sys.stdout.write(sys.stdin.read()); sys.exit(3)'], input=b'hello')
+
+    chunks = []
+    result_1 = yield easytask.yield_subprocess([sys.executable, '-c', 'print(1)'], on_stdout=chunks.append)
+
+    return result_0.returncode == 3 and result_0.stdout == b'hello' and \
+           result_1.returncode == 0 and result_1.stdout is None and b''.join(chunks).strip() == b'1'
+
+@easytask.taskmethod()
+def subprocess_task_sleep() -> easytask.Task:
+    yield easytask.yield_subprocess([sys.executable, '-c', 'import time; time.sleep(60)'])
+
+def subprocess():
+    if not subprocess_task().wait().result():
+        return False
+
+    t = subprocess_task_sleep()
+    while easytask.get_subprocesses_info()['running'] == 0:
+        time.sleep(0.01)
+    t.cancel()
+
+    # child is killed
+    time_start = time.perf_counter()
+    while easytask.get_subprocesses_info()['running'] != 0:
+        if time.perf_counter() - time_start > 10.0:
+            return False
+        time.sleep(0.01)
+    return True
+
+@easytask.cluster.remotemethod()
+@easytask.taskmethod()
+def cluster_square(x) -> easytask.Task:
+    yield easytask.yield_sleep_tick()
+    return os.getpid(), x*x
+
+@easytask.cluster.remotemethod()
+def cluster_fail(x):
+    raise ValueError(x)
+
+@easytask.cluster.remotemethod()
+@easytask.taskmethod()
+def cluster_sleep(cancelled_path=None) -> easytask.Task:
+    try:
+        yield easytask.yield_sleep(60.0)
+    except easytask.ETaskDone:
+        if cancelled_path is not None:
+            # seen by test in coordinator process
+            open(cancelled_path, 'w').close()
+
+@easytask.taskmethod()
+def cluster_task() -> easytask.Task:
+    tasks = [ easytask.cluster.get_coordinator().call('cluster_square', x) for x in range(16) ]
+    yield easytask.yield_wait(tasks)
+
+    result = yield easytask.cluster.yield_remote(cluster_square, 3)
+    try:
+        yield easytask.cluster.yield_remote('cluster_fail', -1)
+        return False
+    except ValueError:
+        ...
+
+    return [ task.result()[1] for task in tasks ] == [ x*x for x in range(16) ] and \
+           len(set( task.result()[0] for task in tasks )) == 2 and result[1] == 9
+
+def cluster_remote():
+    coordinator = easytask.cluster.Coordinator()
+    coordinator.spawn_workers(2, modules=['easytask._core.test'], concurrency=4)
+    if not coordinator.wait_workers(2, timeout=30.0):
+        coordinator.finalize()
+        return False
+
+    result = cluster_task().wait().result()
+
+    # cancellation is delivered to worker
+    with tempfile.TemporaryDirectory() as dir:
+        cancelled_path = os.path.join(dir, 'cancelled')
+        t = coordinator.call('cluster_sleep', cancelled_path)
+        while sum(info['calls'] for info in coordinator.get_workers_info()) == 0:
+            time.sleep(0.01)
+        t.cancel()
+        result = result and sum(info['calls'] for info in coordinator.get_workers_info()) == 0
+
+        time_start = time.monotonic()
+        while not os.path.exists(cancelled_path) and time.monotonic() - time_start < 10.0:
+            time.sleep(0.01)
+        result = result and os.path.exists(cancelled_path)
+
+    # peer without authkey is rejected before unpickling
+    log_level = get_log_level()
+    set_log_level(0)
+    with socket.create_connection(coordinator.get_address()) as sock:
+        data = pickle.dumps(('hello', 'intruder', ['cluster_square'], 1))
+        sock.sendall(struct.pack('<I', len(data)) + data)
+        time.sleep(0.2)
+    set_log_level(log_level)
+    result = result and len(coordinator.get_workers_info()) == 2
+
+    # calls of lost worker are cancelled with exception
+    log_level = get_log_level()
+    set_log_level(0)
+    tasks = [ coordinator.call('cluster_sleep') for _ in range(2) ]
+    while sum(info['calls'] for info in coordinator.get_workers_info()) != 2:
+        time.sleep(0.01)
+    coordinator._processes[0].kill()
+    while not any(task.is_done() for task in tasks):
+        time.sleep(0.01)
+    lost_tasks = [ task for task in tasks if task.is_done() ]
+    result = result and all(task.exception() is not None for task in lost_tasks) and \
+             len(coordinator.get_workers_info()) == 1
+    for task in tasks:
+        task.cancel()
+
+    coordinator.finalize()
+    set_log_level(log_level)
+    return result
+
+@easytask.taskmethod()
+def file_read_task(path) -> easytask.Task:
+    data = yield easytask.yield_read_file(path, offset=10, size=100)
+    if bytes(data) != bytes(range(10, 110)):
+        return False
+
+    reader = easytask.FileReader(path, chunk_size=100, readahead=3)
+    chunks = []
+    while True:
+        chunk = yield easytask.yield_read(reader)
+        if len(chunk) == 0:
+            break
+        chunks.append(bytes(chunk))
+
+    try:
+        yield easytask.yield_read_file(path + '.not_exist')
+        return False
+    except FileNotFoundError:
+        ...
+
+    return len(chunks) == 11 and b''.join(chunks) == bytes(range(256))*4
+
+def file_read():
+    with tempfile.TemporaryDirectory() as dir:
+        path = os.path.join(dir, 'file')
+        with open(path, 'wb') as file:
+            file.write(bytes(range(256))*4)
+        return file_read_task(path).wait().result()
+
+@easytask.taskmethod()
+def cpu_affinity_task(thread) -> easytask.Task:
+    yield easytask.yield_switch_thread(thread)
+    return os.sched_getaffinity(0)
+
+def cpu_affinity():
+    if not hasattr(os, 'sched_setaffinity'):
+        return True
+
+    main_affinity = os.sched_getaffinity(0)
+    threads = easytask.create_pinned_threads('core') + easytask.create_pinned_threads('numa')
+    result = len(threads) == len(os.sched_getaffinity(0)) + len(easytask.get_numa_nodes())
+    for thread in threads:
+        affinity = cpu_affinity_task(thread).wait().result()
+        result = result and affinity == thread.get_cpu_affinity() and '[CPU ' in thread.get_printable_info()
+        thread.finalize()
+
+    # affinity of main OS thread is not changed
+    return result and os.sched_getaffinity(0) == main_affinity
+
+def lock_profiling():
+    easytask.reset_lock_profile()
+    easytask.set_lock_profiling(True)
+    result = multi_thread()
+    easytask.set_lock_profiling(False)
+
+    lock_profile = easytask.get_lock_profile()
+    easytask.reset_lock_profile()
+
+    return result and all( site in lock_profile and lock_profile[site].acquire_count != 0
+                           for site in ['Task._lock', 'Task._done_lock', 'yield_wait._lock'] )
+
 def run_test():
     """
     """
@@ -269,7 +1193,11 @@ def run_test():
     tests = [simple_return, branch_true_1, branch_false_cancel,
              sleep_1, propagate, wait_multi, taskset, taskset_fetch, taskset_scope,
              compute_in_single_thread, thread, multi_thread,
-             done_exception]
+             done_exception, call, virtual_clock, lock_profiling, stream, graph,
+             periodic, timers, leak_detection, task_registry, fair_thread, watchdog,
+             interpreter_thread, shared_buffer, batcher, lazy, taskset_cancel,
+             subprocess, cluster_remote, file_read, cpu_affinity, adaptive_limiter,
+             recorder, foreign_wait]
 
     tests_result = []
 
@@ -0,0 +1,185 @@
+import sys
+import threading
+import time
+import traceback
+from typing import Callable, List, Tuple, Union
+
+from .log import get_log_level
+from .Task import Task
+from .Thread import Thread
+
+
+class WatchdogReport:
+    def __init__(self, thread : Thread, reason : str, duration : float, task : Union[Task, None],
+                       task_stack : List[str], thread_stack : List[str], history : List[Tuple[float, float, str]], queue_size : int):
+        """
+        Report of stalled easytask.Thread.
+
+            reason      'stall' : Task is executed longer than stall_time without yield
+                        'queue' : oldest queued Task waits longer than queue_time
+
+            duration    seconds of stall or waiting in queue
+            task        Task executed at the moment of report
+            task_stack  lines of generator frames of the Task (including yield_call's) from outer to inner
+            thread_stack  lines of stack of the OS thread
+            history     last executions of Tasks in the Thread: (seconds ago, duration, Task name)
+        """
+        self.thread = thread
+        self.reason = reason
+        self.duration = duration
+        self.task = task
+        self.task_stack = task_stack
+        self.thread_stack = thread_stack
+        self.history = history
+        self.queue_size = queue_size
+
+    def __repr__(self): return self.__str__()
+    def __str__(self):
+        s = f'[WatchdogReport][{self.reason}] {self.thread} {self.reason} for {self.duration*1000.0:.1f}ms, queued tasks: {self.queue_size}'
+        if self.task is not None:
+            s += f'\nExecuting task: {self.task}'
+        if len(self.task_stack) != 0:
+            s += '\nTask stack:\n' + '\n'.join(self.task_stack)
+        if len(self.thread_stack) != 0:
+            s += '\nThread stack:\n' + ''.join(self.thread_stack)
+        if len(self.history) != 0:
+            s += '\nRecent executions:'
+            for ago, duration, name in self.history:
+                s += f'\n{ago*1000.0:10.1f}ms ago {duration*1000.0:8.3f}ms {name}'
+        return s
+
+
+class _Watchdog:
+    def __init__(self, stall_time : float, queue_time : float, interval : float, on_report : Callable[[WatchdogReport], None]):
+        self._stall_time = stall_time
+        self._queue_time = queue_time
+        self._interval = interval
+        self._on_report = on_report
+
+        self._reported = set()      # (Thread, reason, start time) of already reported stalls
+        self._stop_ev = threading.Event()
+        self._t = threading.Thread(target=self._thread_func, name='easytask watchdog', daemon=True)
+        self._t.start()
+
+    def stop(self):
+        self._stop_ev.set()
+        self._t.join()
+
+    def _thread_func(self):
+        while not self._stop_ev.wait(self._interval):
+            reported = set()
+            for thread in Thread._get_threads():
+                for key in self._check_thread(thread):
+                    reported.add(key)
+            # forget finished stalls
+            self._reported = reported
+
+    def _check_thread(self, thread : Thread):
+        now = time.perf_counter()
+
+        task, exec_start = thread._exec_task, thread._exec_start
+        if task is not None and now - exec_start >= self._stall_time:
+            key = (thread, 'stall', exec_start)
+            yield key
+            if key not in self._reported:
+                self._report(thread, 'stall', now - exec_start, task, now)
+
+        # (waiting time, key) of oldest Task in queue, in scheduling groups of fair Thread and in timers past deadline
+        waits = []
+        for queue_since in (thread._queue_since, thread._fair_queue_since):
+            if queue_since is not None:
+                waits.append( (now - queue_since, (thread, 'queue', queue_since)) )
+
+        deadline = self._get_first_deadline(thread)
+        if deadline is not None:
+            waits.append( (thread.get_clock().time() - deadline, (thread, 'queue', deadline)) )
+
+        waits = [ wait for wait in waits if wait[0] >= self._queue_time ]
+        if len(waits) != 0:
+            for _, key in waits:
+                yield key
+            duration, key = max(waits, key=lambda wait: wait[0])
+            if all( key not in self._reported for _, key in waits ):
+                self._report(thread, 'queue', duration, task, now)
+
+    def _get_first_deadline(self, thread : Thread) -> Union[float, None]:
+        # earliest deadline of sleeping Tasks, the lists are changed concurrently by the Thread
+        if thread.get_clock().is_virtual():
+            return None
+        deadlines = [ deadline for deadline, task in tuple(thread._new_timers or ()) if not task.is_done() ]
+        try:
+            deadline, _, task = thread._timers[0]
+            if not task.is_done():
+                deadlines.append(deadline)
+        except IndexError:
+            pass
+        return min(deadlines, default=None)
+
+    def _report(self, thread : Thread, reason : str, duration : float, task : Union[Task, None], now : float):
+        task_stack = []
+        executor = getattr(task, '_executor', None)
+        if executor is not None:
+            gens = list(getattr(executor, '_gen_stack', ())) + [getattr(executor, '_gen', None)]
+            for gen in gens:
+                # follow `yield from` delegation
+                while gen is not None:
+                    frame = getattr(gen, 'gi_frame', None)
+                    if frame is not None:
+                        code = frame.f_code
+                        task_stack.append(f'  File "{code.co_filename}", line {frame.f_lineno}, in {code.co_name}')
+                    gen = getattr(gen, 'gi_yieldfrom', None)
+
+        thread_stack = []
+        frame = sys._current_frames().get(thread.get_ident(), None)
+        if frame is not None:
+            thread_stack = traceback.format_stack(frame)
+
+        history = [ (now - time_start, duration, name) for time_start, duration, name in tuple(thread._history) ]
+
+        report = WatchdogReport(thread, reason, duration, task, task_stack, thread_stack, history, thread.get_active_tasks_count())
+        try:
+            self._on_report(report)
+        except Exception as e:
+            print(f'Unhandled exception {e} occured in watchdog report function. Traceback:\n{traceback.format_exc()}')
+
+
+_WATCHDOG : _Watchdog = None
+
+def _print_report(report : WatchdogReport):
+    if get_log_level() >= 1:
+        print(f'\n{report}\n')
+
+def start_watchdog(stall_time : float = 0.1, queue_time : float = 1.0, interval : float = None,
+                   on_report : Callable[[WatchdogReport], None] = None):
+    """
+    Start watchdog OS thread, which reports easytask.Thread's stalled by long executed Task
+    or by Task waiting in queue too long.
+
+        stall_time(0.1)     seconds of Task execution without yield
+        queue_time(1.0)     seconds of waiting of oldest Task in queue of Thread,
+                            in scheduling groups of fair Thread, or after deadline of its sleep
+        interval(None)      seconds between checks, default is half of min(stall_time, queue_time)
+        on_report(None)     called with WatchdogReport in watchdog OS thread, default prints the report
+
+    Every stall is reported once.
+    """
+    global _WATCHDOG
+    stop_watchdog()
+
+    if interval is None:
+        interval = min(stall_time, queue_time) / 2.0
+    if on_report is None:
+        on_report = _print_report
+
+    Thread._watched = True
+    _WATCHDOG = _Watchdog(stall_time, queue_time, interval, on_report)
+
+def stop_watchdog():
+    global _WATCHDOG
+    if _WATCHDOG is not None:
+        Thread._watched = False
+        _WATCHDOG.stop()
+        _WATCHDOG = None
+
+def is_watchdog_running() -> bool:
+    return _WATCHDOG is not None
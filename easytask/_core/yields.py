@@ -1,10 +1,9 @@
-import threading
-from datetime import datetime
-from typing import Iterable, Set, Union
+from typing import Callable, Dict, Iterable, Sequence, Set, Union
 
+from .lock_profiler import create_lock
 from .Task import Task
 from .Taskset import Taskset
-from .Thread import Thread
+from .Thread import Thread, get_current_thread
 
 
 class yield_add_to:
@@ -34,6 +33,73 @@ class yield_propagate:
         """Wait Task and returns it's result as result of this Task"""
         self._task = task
 
+class yield_emit:
+    def __init__(self, item):
+        """
+        Emit item from StreamTask taskmethod.
+        Execution is suspended while buffer of StreamTask is full.
+        """
+        self._item = item
+
+class yield_next:
+    def __init__(self, task : 'StreamTask', default = None):
+        """
+        Wait next item from StreamTask and return it.
+
+        Returns `default` when StreamTask is done and all items are consumed, same as builtin next(iterator, default).
+        """
+        self._task = task
+        self._default = default
+
+class yield_admit:
+    def __init__(self, limiter : 'AdaptiveLimiter'):
+        """
+        Admit current Task to easytask.AdaptiveLimiter.
+
+        Task is suspended without cost while the limit of the limiter is reached.
+        The Task holds its place in the limiter until it is done.
+        Exception is raised if the queue of the limiter is full.
+        """
+        self._limiter = limiter
+
+class yield_batch:
+    def __init__(self, batcher : 'Batcher', item):
+        """
+        Add item to easytask.Batcher and wait result of the item.
+
+        Task is suspended without cost until batch is processed.
+        Exception of the item is raised in the Task.
+        """
+        self._batcher = batcher
+        self._item = item
+
+class yield_subprocess:
+    def __init__(self, args : Union[str, Sequence[str]], input : bytes = None,
+                       on_stdout : Callable[[bytes], None] = None, on_stderr : Callable[[bytes], None] = None,
+                       cwd : str = None, env : Dict[str, str] = None):
+        """
+        Run child process and wait its exit without blocking the Thread.
+        Returns subprocess.CompletedProcess with returncode, stdout and stderr.
+
+            input(None)         bytes written to stdin of the process
+
+            on_stdout(None)     called with chunks of stdout in easytask subprocess reactor OS thread,
+            on_stderr(None)     output is not collected then and CompletedProcess.stdout/stderr is None.
+
+        Amount of running child processes is limited by easytask.set_max_subprocesses(count).
+        Process is killed if the Task is cancelled.
+        Exception of starting the process is raised in the Task.
+        """
+        self._args = args
+        self._input = input
+        self._on_stdout = on_stdout
+        self._on_stderr = on_stderr
+        self._cwd = cwd
+        self._env = env
+
+    def __repr__(self): return self.__str__()
+    def __str__(self): return f'[yield_subprocess][{self._args}]'
+
 class yield_switch_thread:
     def __init__(self, thread : Thread):
         """
@@ -43,6 +109,71 @@ class yield_switch_thread:
         """
         self._thread = thread
 
+class yield_call:
+    def __init__(self, func, *args, **kwargs):
+        """
+        Call taskmethod `func` inline in current Task and return it's result.
+
+        ```
+            result = yield easytask.yield_call(sub_taskmethod, 1, 2)
+            # or
+            result = yield from easytask.yield_call(sub_taskmethod, 1, 2)
+        ```
+
+        No Task is created for the call. `func` is executed on the execution stack of current Task,
+        so it shares Thread, Taskset's and cancellation of current Task.
+        Unhandled exception of `func` is raised in the caller.
+        `yield_success`/`yield_cancel` inside `func` are applied to current Task.
+        """
+        self._func = getattr(func, '_wrapped_method', func)
+        self._args = args
+        self._kwargs = kwargs
+
+    def __iter__(self):
+        return (yield self)
+
+class yield_read_file:
+    def __init__(self, path : str, offset : int = 0, size : int = None):
+        """
+        Read `size` bytes (default until end of file) from `offset` of file in I/O thread
+        without blocking the Thread, returns memoryview of the data.
+
+        Exception of reading is raised in the Task.
+        Use easytask.FileReader to read big files by chunks.
+        """
+        self._path = path
+        self._offset = offset
+        self._size = size
+
+class yield_read:
+    def __init__(self, reader : 'FileReader'):
+        """
+        Read next chunk from easytask.FileReader, returns memoryview.
+
+        memoryview is valid until next yield_read, because its buffer is reused.
+        Returns empty memoryview at the end of file.
+        """
+        self._reader = reader
+
+class yield_remote:
+    def __init__(self, name : Union[str, Callable], *args, **kwargs):
+        """
+        Call remote method in least loaded worker of default easytask.cluster.Coordinator and return its result.
+
+        Task is resumed in its Thread. Exception of the method is raised in the Task.
+        Cancellation of the Task cancels the call in worker.
+        """
+        # cluster is imported only by the programs which use it
+        from .cluster import Coordinator
+
+        coordinator = Coordinator._default
+        if coordinator is None:
+            raise Exception('No easytask.cluster.Coordinator.')
+        self._coordinator = coordinator
+        self._name = name
+        self._args = args
+        self._kwargs = kwargs
+
 class yield_sleep:
     def __init__(self, sec : float):
         """
@@ -52,11 +183,25 @@ class yield_sleep:
 
         Use `yield_sleep_tick()` to sleep minimal amount of time.
         """
-        self._time = datetime.now().timestamp()
-        self._sec = sec
+        self._clock = clock = get_current_thread().get_clock()
+        self._deadline = clock.time() + sec
+
+    def is_done(self):
+        return self._clock.time() >= self._deadline
+
+class yield_sleep_until:
+    def __init__(self, deadline : float):
+        """
+        Sleep execution of this Task until clock of current Thread reaches `deadline`.
+
+        `deadline` is absolute time of easytask.get_current_thread().get_clock().time() (monotonic),
+        so repeating sleeps don't accumulate drift.
+        """
+        self._clock = get_current_thread().get_clock()
+        self._deadline = deadline
 
     def is_done(self):
-        return (datetime.now().timestamp() - self._time) >= self._sec
+        return self._clock.time() >= self._deadline
 
 class yield_sleep_tick:
     def __init__(self):
@@ -69,7 +214,7 @@ class yield_wait:
         if not isinstance(task_or_list, Iterable):
             task_or_list = (task_or_list,)
 
-        self._lock = threading.Lock()
+        self._lock = create_lock('yield_wait._lock')
         self._count = len(task_or_list)
 
         for task in task_or_list: